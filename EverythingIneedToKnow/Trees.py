@@ -9,35 +9,94 @@ Contents
 ========
 1) Binary tree utilities
    - TreeNode (binary)
+   - ArrayTree (compact struct-of-arrays binary tree, converts to/from TreeNode)
    - build_tree_from_level_list / serialize_level
-   - pretty_print
+   - binary file format: write_tree_binary / TreeFileWriter (streaming),
+     MappedTree (mmap-backed, lazily decoded), read_tree_binary
+   - pretty_print (buffered, iterative; max_depth / max_nodes elision, file output),
+     pretty_lines / pretty_pages for streaming the same text
    - size, height, is_balanced, diameter
    - traversals: preorder/inorder/postorder (recursive & iterative)
    - level_order / zigzag level order
+   - lazy generator traversals (*_lazy) and O(1)-memory Morris inorder/preorder
    - root_to_leaf_paths, has_path_sum
    - lowest_common_ancestor (LCA) for binary tree
+   - LCAIndex: O(1) LCA queries (single or batched) on a static tree
+   - forest_stats: size/height/diameter/has_path_sum over many trees in a process pool
 
 2) Binary Search Tree (BST)
-   - insert, search, delete
-   - kth_smallest, validate_bst
+   - insert, search, delete (optionally self-balancing: AVL)
+   - from_sorted: O(n) perfectly balanced bulk load
+   - order statistics from subtree sizes: kth_smallest, rank, count_in_range,
+     select_many / rank_many (batched)
+   - validate_bst
+   - len / height / is_balanced in O(1) from per-node metadata
+   - range(lo, hi) lazy in-range iteration, delete_range, split / join at a key
+   - PersistentBST: path-copying updates, O(1) snapshot() versions for lock-free readers
 
 3) N-ary Tree (general tree)
-   - NaryNode, dfs, bfs
+   - NaryNode, dfs, bfs (+ nary_bfs_lazy)
+   - CSRTree: compressed-sparse-row N-ary tree, bulk from_parents, level-at-a-time BFS
 
 4) Trie (prefix tree)
    - insert, search, starts_with, delete (safe delete)
+   - weighted insert + complete(prefix, k) autocomplete with per-node cached top-k
+   - ShardedTrie: per-shard locks for concurrent writers, lock-free reads, bulk merge
+   - RadixTrie: compressed trie with sorted child arrays, O(n) from_sorted,
+     freeze() into flat read-only buffers
 
 5) Heap (array-based binary min-heap via heapq)
+   - demo_heap (heapify bulk build), MinHeap / MaxHeap (no negation)
+   - IndexedHeap: handles with O(log n) decrease_key / update / remove
+   - kway_merge: streaming merge of sorted inputs
 
 6) Segment Tree (range sum with point update)
+   - range_sum_many: batched queries, prefix-sum offline path
+   - LazySegmentTree: any Monoid (sum/min/max/gcd/custom) with lazy
+     range add and range assign
 
 All code uses only the Python standard library.
 """
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Any, Callable, Deque, Generator, Iterable, List, Optional, Tuple
-from collections import deque
+from typing import Any, Callable, Deque, Generator, Iterable, List, Optional, Tuple, Union
+from collections import Counter, deque
+import bisect
+import concurrent.futures
+import copy
 import heapq
+import importlib
+import itertools
+import math
+import operator
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+
+
+def _stdlib_module(name: str) -> Any:
+    """Import a standard-library module, ignoring same-named files in this folder.
+
+    The notes next to this file include `array.py`, which shadows the stdlib
+    `array` module whenever a script in this folder is run directly.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    cached = sys.modules.get(name)
+    if cached is not None and os.path.dirname(os.path.abspath(getattr(cached, "__file__", None) or "")) == here:
+        del sys.modules[name]
+    saved = sys.path[:]
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != here]
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path[:] = saved
+
+
+array = _stdlib_module("array").array
 
 # =============================================================
 # 1) Binary Tree Utilities
@@ -53,7 +112,290 @@ class TreeNode:
         return f"TreeNode({self.val!r})"
 
 
-def build_tree_from_level_list(values: List[Optional[Any]]) -> Optional[TreeNode]:
+NIL = -1  # "no child" marker for ArrayTree index arrays
+
+
+class ArrayTree:
+    """A binary tree stored as parallel arrays instead of one object per node.
+
+    Node i has value `vals[i]` and children `left[i]` / `right[i]` (indices,
+    NIL when absent). The arrays form an append-only arena, so every stored
+    slot is a node of the tree and `len(tree)` is its size.
+
+    Pass a `typecode` (e.g. "q" or "d") to pack numeric values into an
+    `array` as well; by default values live in a plain list.
+
+    The module-level helpers (serialize_level, size, height, traversals)
+    accept an ArrayTree wherever they accept a TreeNode root.
+    """
+    __slots__ = ("vals", "left", "right", "root")
+
+    def __init__(self, typecode: Optional[str] = None):
+        self.vals: Any = array(typecode) if typecode else []
+        self.left = array("q")
+        self.right = array("q")
+        self.root = NIL
+
+    def __len__(self) -> int:
+        return len(self.left)
+
+    def __repr__(self) -> str:
+        return f"ArrayTree(size={len(self)})"
+
+    def add(self, val: Any) -> int:
+        """Append a detached node and return its index."""
+        self.vals.append(val)
+        self.left.append(NIL)
+        self.right.append(NIL)
+        return len(self.left) - 1
+
+    @classmethod
+    def from_level_list(cls, values: List[Optional[Any]], typecode: Optional[str] = None) -> 'ArrayTree':
+        tree = cls(typecode)
+        if not values or values[0] is None:
+            return tree
+        it = iter(values)
+        tree.root = tree.add(next(it))
+        left, right, add = tree.left, tree.right, tree.add
+        i = 0  # nodes are appended in BFS order, so the parent queue is just a counter
+        for a, b in itertools.zip_longest(it, it):
+            if a is not None:
+                left[i] = add(a)
+            if b is not None:
+                right[i] = add(b)
+            i += 1
+        return tree
+
+    @classmethod
+    def from_treenode(cls, root: Optional[TreeNode], typecode: Optional[str] = None) -> 'ArrayTree':
+        tree = cls(typecode)
+        if not root:
+            return tree
+        tree.root = tree.add(root.val)
+        q: Deque[Tuple[TreeNode, int]] = deque([(root, tree.root)])
+        while q:
+            node, i = q.popleft()
+            if node.left:
+                tree.left[i] = tree.add(node.left.val)
+                q.append((node.left, tree.left[i]))
+            if node.right:
+                tree.right[i] = tree.add(node.right.val)
+                q.append((node.right, tree.right[i]))
+        return tree
+
+    def to_treenode(self) -> Optional[TreeNode]:
+        if self.root == NIL:
+            return None
+        nodes = [TreeNode(v) for v in self.vals]
+        for node, l, r in zip(nodes, self.left, self.right):
+            if l != NIL:
+                node.left = nodes[l]
+            if r != NIL:
+                node.right = nodes[r]
+        return nodes[self.root]
+
+    # --- index-based algorithms used by the module-level helpers ---
+
+    def preorder(self) -> List[Any]:
+        if self.root == NIL:
+            return []
+        vals, left, right = self.vals, self.left, self.right
+        stack = [self.root]
+        out: List[Any] = []
+        while stack:
+            i = stack.pop()
+            out.append(vals[i])
+            r, l = right[i], left[i]
+            if r != NIL:
+                stack.append(r)
+            if l != NIL:
+                stack.append(l)
+        return out
+
+    def inorder(self) -> List[Any]:
+        vals, left, right = self.vals, self.left, self.right
+        out: List[Any] = []
+        stack: List[int] = []
+        cur = self.root
+        while cur != NIL or stack:
+            while cur != NIL:
+                stack.append(cur)
+                cur = left[cur]
+            cur = stack.pop()
+            out.append(vals[cur])
+            cur = right[cur]
+        return out
+
+    def postorder(self) -> List[Any]:
+        if self.root == NIL:
+            return []
+        vals, left, right = self.vals, self.left, self.right
+        stack = [self.root]
+        out: List[Any] = []
+        while stack:
+            i = stack.pop()
+            out.append(vals[i])
+            l, r = left[i], right[i]
+            if l != NIL:
+                stack.append(l)
+            if r != NIL:
+                stack.append(r)
+        return out[::-1]
+
+    def levels(self) -> List[List[Any]]:
+        vals, left, right = self.vals, self.left, self.right
+        frontier = [self.root] if self.root != NIL else []
+        levels: List[List[Any]] = []
+        while frontier:
+            levels.append([vals[i] for i in frontier])
+            nxt: List[int] = []
+            for i in frontier:
+                l, r = left[i], right[i]
+                if l != NIL:
+                    nxt.append(l)
+                if r != NIL:
+                    nxt.append(r)
+            frontier = nxt
+        return levels
+
+    def preorder_lazy(self) -> Generator[Any, None, None]:
+        vals, left, right = self.vals, self.left, self.right
+        stack = [self.root] if self.root != NIL else []
+        while stack:
+            i = stack.pop()
+            yield vals[i]
+            r, l = right[i], left[i]
+            if r != NIL:
+                stack.append(r)
+            if l != NIL:
+                stack.append(l)
+
+    def inorder_lazy(self) -> Generator[Any, None, None]:
+        vals, left, right = self.vals, self.left, self.right
+        stack: List[int] = []
+        cur = self.root
+        while cur != NIL or stack:
+            while cur != NIL:
+                stack.append(cur)
+                cur = left[cur]
+            cur = stack.pop()
+            yield vals[cur]
+            cur = right[cur]
+
+    def postorder_lazy(self) -> Generator[Any, None, None]:
+        vals, left, right = self.vals, self.left, self.right
+        stack: List[int] = []
+        cur, last = self.root, NIL
+        while cur != NIL or stack:
+            while cur != NIL:
+                stack.append(cur)
+                cur = left[cur]
+            i = stack[-1]
+            r = right[i]
+            if r != NIL and r != last:
+                cur = r
+            else:
+                stack.pop()
+                yield vals[i]
+                last = i
+
+    def levels_lazy(self) -> Generator[List[Any], None, None]:
+        vals, left, right = self.vals, self.left, self.right
+        frontier = [self.root] if self.root != NIL else []
+        while frontier:
+            yield [vals[i] for i in frontier]
+            nxt: List[int] = []
+            for i in frontier:
+                l, r = left[i], right[i]
+                if l != NIL:
+                    nxt.append(l)
+                if r != NIL:
+                    nxt.append(r)
+            frontier = nxt
+
+    def height(self) -> int:
+        left, right = self.left, self.right
+        frontier = [self.root] if self.root != NIL else []
+        h = -1
+        while frontier:
+            h += 1
+            nxt: List[int] = []
+            for i in frontier:
+                l, r = left[i], right[i]
+                if l != NIL:
+                    nxt.append(l)
+                if r != NIL:
+                    nxt.append(r)
+            frontier = nxt
+        return h
+
+    def diameter(self) -> int:
+        left, right = self.left, self.right
+        h = [0] * len(self)
+        best = 0
+        # Reversed preorder visits children before parents.
+        stack = [self.root] if self.root != NIL else []
+        order: List[int] = []
+        while stack:
+            i = stack.pop()
+            order.append(i)
+            l, r = left[i], right[i]
+            if l != NIL:
+                stack.append(l)
+            if r != NIL:
+                stack.append(r)
+        for i in reversed(order):
+            l, r = left[i], right[i]
+            hl = h[l] if l != NIL else -1
+            hr = h[r] if r != NIL else -1
+            if hl + hr + 2 > best:
+                best = hl + hr + 2
+            h[i] = 1 + (hl if hl > hr else hr)
+        return best
+
+    def has_path_sum(self, target_sum: Any) -> bool:
+        vals, left, right = self.vals, self.left, self.right
+        nodes = [self.root] if self.root != NIL else []
+        remaining = [target_sum]
+        while nodes:
+            i = nodes.pop()
+            rest = remaining.pop() - vals[i]
+            l, r = left[i], right[i]
+            if l == NIL and r == NIL:
+                if rest == 0:
+                    return True
+                continue
+            if l != NIL:
+                nodes.append(l)
+                remaining.append(rest)
+            if r != NIL:
+                nodes.append(r)
+                remaining.append(rest)
+        return False
+
+    def serialize(self) -> List[Optional[Any]]:
+        if self.root == NIL:
+            return []
+        vals, left, right = self.vals, self.left, self.right
+        q: Deque[int] = deque([self.root])
+        out: List[Optional[Any]] = []
+        while q:
+            i = q.popleft()
+            if i == NIL:
+                out.append(None)
+                continue
+            out.append(vals[i])
+            q.append(left[i])
+            q.append(right[i])
+        while out and out[-1] is None:
+            out.pop()
+        return out
+
+
+BinaryTree = Union[TreeNode, ArrayTree]
+
+
+def build_tree_from_level_list(values: List[Optional[Any]], compact: bool = False) -> Optional[BinaryTree]:
     """Build a binary tree from a level-order list where None means 'no node'.
     Example: [1,2,3,None,4] =>
         1
@@ -61,7 +403,10 @@ def build_tree_from_level_list(values: List[Optional[Any]]) -> Optional[TreeNode
       2   3
        \
         4
+    With compact=True an ArrayTree is returned instead of TreeNode objects.
     """
+    if compact:
+        return ArrayTree.from_level_list(values)
     if not values:
         return None
     it = iter(values)
@@ -70,7 +415,7 @@ def build_tree_from_level_list(values: List[Optional[Any]]) -> Optional[TreeNode
         return None
     root = TreeNode(root_val)
     q: Deque[TreeNode] = deque([root])
-    for a, b in zip(it, it):  # consume two children at a time
+    for a, b in itertools.zip_longest(it, it):  # consume two children at a time
         node = q.popleft()
         if a is not None:
             node.left = TreeNode(a)
@@ -81,8 +426,10 @@ def build_tree_from_level_list(values: List[Optional[Any]]) -> Optional[TreeNode
     return root
 
 
-def serialize_level(root: Optional[TreeNode]) -> List[Optional[Any]]:
+def serialize_level(root: Optional[BinaryTree]) -> List[Optional[Any]]:
     """Serialize a tree back to level-order list (trim trailing None)."""
+    if isinstance(root, ArrayTree):
+        return root.serialize()
     if not root:
         return []
     q: Deque[Optional[TreeNode]] = deque([root])
@@ -101,83 +448,443 @@ def serialize_level(root: Optional[TreeNode]) -> List[Optional[Any]]:
     return out
 
 
-def pretty_print(root: Optional[TreeNode]) -> None:
-    """Print the tree sideways for quick visualization."""
-    def _pp(node: Optional[TreeNode], indent: str, last: bool) -> None:
-        if not node:
+# --- Binary on-disk format ------------------------------------------------------
+# Layout (little-endian):
+#   header  | packed values | presence bitmap | rank directory
+# The bitmap has one bit per slot of the serialize_level list (bit set = node
+# present). As in that list, the children of the k-th present node (BFS
+# order) sit in slots 2k+1 and 2k+2, and the node's value is values[k]. The
+# rank directory stores, per 512-bit block, the number of present nodes before
+# it, so the rank of any slot needs one lookup plus a popcount of <= 64 bytes;
+# that is what lets MappedTree walk a subtree without decoding the file.
+
+_TREE_FILE_MAGIC = b"BTRE"
+_TREE_FILE_HEADER = struct.Struct("<4sBcxxQQQQQ")  # magic, version, typecode, n_slots, n_nodes, 3 offsets
+_RANK_BLOCK_BITS = 512
+
+
+class TreeFileWriter:
+    """Stream a tree to the binary format one level-order slot at a time.
+
+    Feed it the same values serialize_level would produce (None = no node)
+    via add(); only a bounded buffer is held in memory. Trailing Nones are
+    dropped. Values must fit the struct/array `typecode` (default int64).
+    """
+
+    def __init__(self, path: str, typecode: str = "q"):
+        if struct.calcsize("<" + typecode) != array(typecode).itemsize:
+            raise ValueError(f"typecode {typecode!r} has a platform-dependent size")
+        self.typecode = typecode
+        self._pack = struct.Struct("<" + typecode).pack
+        self._file = open(path, "wb")
+        self._file.write(bytes(_TREE_FILE_HEADER.size))
+        self._bits = tempfile.TemporaryFile()
+        self._vals = bytearray()
+        self._bitbuf = bytearray()
+        self._byte = 0
+        self._slots = 0
+        self._nodes = 0
+        self._pending_none = 0
+        self._rank_dir = array("Q")
+
+    def __enter__(self) -> 'TreeFileWriter':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _push_bit(self, present: bool) -> None:
+        s = self._slots
+        if s % _RANK_BLOCK_BITS == 0:
+            self._rank_dir.append(self._nodes)
+        if present:
+            self._byte |= 1 << (s & 7)
+        if s & 7 == 7:
+            self._bitbuf.append(self._byte)
+            self._byte = 0
+            if len(self._bitbuf) >= 1 << 16:
+                self._bits.write(self._bitbuf)
+                self._bitbuf.clear()
+        self._slots = s + 1
+
+    def add(self, value: Optional[Any]) -> None:
+        if value is None:
+            self._pending_none += 1
+            return
+        for _ in range(self._pending_none):
+            self._push_bit(False)
+        self._pending_none = 0
+        if self._slots and (self._slots - 1) // 2 >= self._nodes:
+            raise ValueError(f"slot {self._slots} has no parent node")
+        self._push_bit(True)
+        self._nodes += 1
+        self._vals += self._pack(value)
+        if len(self._vals) >= 1 << 20:
+            self._file.write(self._vals)
+            self._vals.clear()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        f = self._file
+        f.write(self._vals)
+        if self._slots & 7:
+            self._bitbuf.append(self._byte)
+        self._bits.write(self._bitbuf)
+        bitmap_off = f.tell()
+        self._bits.seek(0)
+        shutil.copyfileobj(self._bits, f)
+        self._bits.close()
+        rank_off = f.tell()
+        if sys.byteorder == "big":
+            self._rank_dir.byteswap()
+        f.write(self._rank_dir.tobytes())
+        f.seek(0)
+        f.write(_TREE_FILE_HEADER.pack(_TREE_FILE_MAGIC, 1, self.typecode.encode(), self._slots,
+                                       self._nodes, _TREE_FILE_HEADER.size, bitmap_off, rank_off))
+        f.close()
+
+
+def _level_slots(root: Optional[BinaryTree]) -> Generator[Optional[Any], None, None]:
+    """Yield serialize_level's values lazily (with trailing Nones)."""
+    if isinstance(root, ArrayTree):
+        vals, left, right = root.vals, root.left, root.right
+        q: Deque[int] = deque([root.root] if root.root != NIL else [])
+        while q:
+            i = q.popleft()
+            if i == NIL:
+                yield None
+                continue
+            yield vals[i]
+            q.append(left[i])
+            q.append(right[i])
+        return
+    nq: Deque[Optional[TreeNode]] = deque([root] if root else [])
+    while nq:
+        node = nq.popleft()
+        if node is None:
+            yield None
+            continue
+        yield node.val
+        nq.append(node.left)
+        nq.append(node.right)
+
+
+def write_tree_binary(path: str, root: Optional[BinaryTree], typecode: str = "q") -> None:
+    with TreeFileWriter(path, typecode) as w:
+        for v in _level_slots(root):
+            w.add(v)
+
+
+class MappedNode:
+    """A lazily decoded node of a MappedTree. Quacks like TreeNode (val/left/
+    right), so the read-only helpers in this file work on it; each access to
+    .left/.right returns a fresh view, so compare nodes by .rank, not `is`."""
+    __slots__ = ("tree", "rank")
+
+    def __init__(self, tree: 'MappedTree', rank: int):
+        self.tree = tree
+        self.rank = rank
+
+    @property
+    def val(self) -> Any:
+        return self.tree.value(self.rank)
+
+    @property
+    def left(self) -> Optional['MappedNode']:
+        return self.tree.child(self.rank, 1)
+
+    @property
+    def right(self) -> Optional['MappedNode']:
+        return self.tree.child(self.rank, 2)
+
+    def __repr__(self) -> str:
+        return f"MappedNode({self.val!r})"
+
+
+class MappedTree:
+    """Read-only view of a file written by TreeFileWriter / write_tree_binary.
+
+    The file is mmap'ed; nothing is decoded up front. `root` gives a
+    MappedNode to walk lazily, to_array_tree() decodes everything at once.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, typecode, self.n_slots, self.n_nodes,
+         self._vals_off, self._bits_off, self._rank_off) = _TREE_FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != _TREE_FILE_MAGIC or version != 1:
+            self.close()
+            raise ValueError(f"{path} is not a tree file")
+        self.typecode = typecode.decode()
+        self._val = struct.Struct("<" + self.typecode)
+
+    def __enter__(self) -> 'MappedTree':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.n_nodes
+
+    def _present(self, slot: int) -> bool:
+        return slot < self.n_slots and (self._mm[self._bits_off + (slot >> 3)] >> (slot & 7)) & 1 == 1
+
+    def _rank(self, slot: int) -> int:
+        """Number of present nodes in slots [0, slot)."""
+        block = slot // _RANK_BLOCK_BITS
+        before = struct.unpack_from("<Q", self._mm, self._rank_off + 8 * block)[0]
+        start = self._bits_off + block * (_RANK_BLOCK_BITS // 8)
+        end = self._bits_off + (slot >> 3)
+        before += int.from_bytes(self._mm[start:end], "little").bit_count()
+        if slot & 7:
+            before += (self._mm[end] & ((1 << (slot & 7)) - 1)).bit_count()
+        return before
+
+    def value(self, rank: int) -> Any:
+        return self._val.unpack_from(self._mm, self._vals_off + rank * self._val.size)[0]
+
+    def child(self, rank: int, side: int) -> Optional[MappedNode]:
+        """side 1 = left, 2 = right."""
+        slot = 2 * rank + side
+        return MappedNode(self, self._rank(slot)) if self._present(slot) else None
+
+    @property
+    def root(self) -> Optional[MappedNode]:
+        return MappedNode(self, 0) if self.n_nodes else None
+
+    def to_array_tree(self) -> ArrayTree:
+        tree = ArrayTree(self.typecode)
+        if not self.n_nodes:
+            return tree
+        tree.vals.frombytes(self._mm[self._vals_off:self._vals_off + self.n_nodes * self._val.size])
+        if sys.byteorder == "big":
+            tree.vals.byteswap()
+        tree.left = array("q", [NIL]) * self.n_nodes
+        tree.right = array("q", [NIL]) * self.n_nodes
+        tree.root = 0
+        left, right = tree.left, tree.right
+        k = 0  # slot 0 (the root) is node 0; the loop assigns 1, 2, ... in slot order
+        for byte_index, byte in enumerate(self._mm[self._bits_off:self._rank_off]):
+            while byte:
+                low = byte & -byte
+                slot = byte_index * 8 + low.bit_length() - 1
+                byte ^= low
+                if slot:
+                    parent, side = divmod(slot - 1, 2)
+                    (right if side else left)[parent] = k
+                k += 1
+        return tree
+
+
+def read_tree_binary(path: str) -> ArrayTree:
+    """Decode a whole tree file into an ArrayTree (.to_treenode() for TreeNodes)."""
+    with MappedTree(path) as t:
+        return t.to_array_tree()
+
+
+def pretty_lines(root: Optional[BinaryTree], max_depth: Optional[int] = None,
+                 max_nodes: Optional[int] = None) -> Generator[str, None, None]:
+    """Yield pretty_print's lines one at a time, walking the tree with an
+    explicit stack. Children of nodes at depth max_depth (root = 0) collapse
+    into a single "…" line; after max_nodes nodes a final "…" line says the
+    output was cut."""
+    if isinstance(root, ArrayTree):
+        vals, left, right = root.vals, root.left, root.right
+        label = vals.__getitem__
+        kids = lambda i: (left[i] if left[i] != NIL else None, right[i] if right[i] != NIL else None)
+        root = root.root if root.root != NIL else None
+    else:
+        label = lambda node: node.val
+        kids = lambda node: (node.left, node.right)
+    stack = [(root, "", True, 0)] if root is not None else []
+    shown = 0
+    while stack:
+        if max_nodes is not None and shown >= max_nodes:
+            yield f"… (stopped after {shown} nodes)"
             return
-        connector = "└── " if last else "├── "
-        print(indent + connector + str(node.val))
+        node, indent, last, depth = stack.pop()
+        yield indent + ("└── " if last else "├── ") + str(label(node))
+        shown += 1
+        l, r = kids(node)
         indent += "    " if last else "│   "
-        children = [node.left, node.right]
-        for i, child in enumerate(children):
-            _pp(child, indent, i == len(children) - 1)
-    _pp(root, "", True)
+        if max_depth is not None and depth >= max_depth:
+            if l is not None or r is not None:
+                yield indent + "└── …"
+            continue
+        # The right child is always drawn as the last branch, even when the
+        # left one is missing. Push right first so left pops (and prints) first.
+        if r is not None:
+            stack.append((r, indent, True, depth + 1))
+        if l is not None:
+            stack.append((l, indent, False, depth + 1))
+
+
+def pretty_pages(root: Optional[BinaryTree], page_chars: int = 1 << 16, max_depth: Optional[int] = None,
+                 max_nodes: Optional[int] = None) -> Generator[str, None, None]:
+    """pretty_print's output as newline-terminated strings of about page_chars
+    characters each. Pages are cut by size, not line count: lines on a deep
+    tree are ~4 chars per level, so a page never holds more than one line
+    beyond page_chars."""
+    page: List[str] = []
+    chars = 0
+    for line in pretty_lines(root, max_depth, max_nodes):
+        page.append(line)
+        chars += len(line) + 1
+        if chars >= page_chars:
+            page.append("")  # trailing newline
+            yield "\n".join(page)
+            page, chars = [], 0
+    if page:
+        page.append("")
+        yield "\n".join(page)
+
+
+def pretty_print(root: Optional[BinaryTree], file: Any = None, max_depth: Optional[int] = None,
+                 max_nodes: Optional[int] = None) -> None:
+    """Print the tree sideways for quick visualization.
+
+    Output goes to `file`: a text stream (default sys.stdout) or a path to
+    write to. Lines are rendered iteratively and written a page at a time,
+    not one print() per node; see pretty_lines for max_depth / max_nodes.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "w", encoding="utf-8") as f:
+            pretty_print(root, f, max_depth, max_nodes)
+        return
+    out = sys.stdout if file is None else file
+    for page in pretty_pages(root, max_depth=max_depth, max_nodes=max_nodes):
+        out.write(page)
 
 
 # --- Structural properties ----------------------------------------------------
+# Everything from here on walks trees with explicit stacks rather than Python
+# recursion, so degenerate (linked-list shaped) trees millions of levels deep
+# work too.
+
+_ABORT = object()  # returned by a _fold_postorder combine to stop the walk early
 
-def size(root: Optional[TreeNode]) -> int:
+
+def _fold_postorder(root: Optional[TreeNode], combine: Callable[[TreeNode, Any, Any], Any], empty: Any) -> Any:
+    """Evaluate combine(node, left_result, right_result) bottom-up, where a
+    missing child contributes `empty`: the iterative form of
+
+        def f(node): return empty if not node else combine(node, f(node.left), f(node.right))
+
+    Frames live in two parallel lists (node, expanded?) and child results on
+    a value stack, so no tuple is allocated per node. If combine returns
+    _ABORT the walk stops and _ABORT is returned.
+    """
     if not root:
-        return 0
-    return 1 + size(root.left) + size(root.right)
+        return empty
+    nodes = [root]
+    expanded = [False]
+    results: List[Any] = []
+    while nodes:
+        node = nodes[-1]
+        if expanded[-1]:
+            nodes.pop()
+            expanded.pop()
+            r = results.pop() if node.right else empty
+            l = results.pop() if node.left else empty
+            res = combine(node, l, r)
+            if res is _ABORT:
+                return _ABORT
+            results.append(res)
+        else:
+            expanded[-1] = True
+            if node.right:
+                nodes.append(node.right)
+                expanded.append(False)
+            if node.left:
+                nodes.append(node.left)
+                expanded.append(False)
+    return results[0]
+
+
+def size(root: Optional[BinaryTree]) -> int:
+    if isinstance(root, ArrayTree):
+        return len(root)
+    count = 0
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        count += 1
+        if node.left:
+            stack.append(node.left)
+        if node.right:
+            stack.append(node.right)
+    return count
 
 
-def height(root: Optional[TreeNode]) -> int:
+def height(root: Optional[BinaryTree]) -> int:
     """Return the number of edges on the longest downward path (empty tree = -1)."""
-    if not root:
-        return -1
-    return 1 + max(height(root.left), height(root.right))
+    if isinstance(root, ArrayTree):
+        return root.height()
+    h = -1
+    frontier = [root] if root else []
+    while frontier:
+        h += 1
+        nxt: List[TreeNode] = []
+        for node in frontier:
+            if node.left:
+                nxt.append(node.left)
+            if node.right:
+                nxt.append(node.right)
+        frontier = nxt
+    return h
 
 
 def is_balanced(root: Optional[TreeNode]) -> bool:
     """AVL-style balance: for every node, |h(left)-h(right)| <= 1."""
-    def dfs(node: Optional[TreeNode]) -> Tuple[bool, int]:
-        if not node:
-            return True, -1
-        bl, hl = dfs(node.left)
-        br, hr = dfs(node.right)
-        balanced = bl and br and abs(hl - hr) <= 1
-        return balanced, 1 + max(hl, hr)
-    return dfs(root)[0]
+    def combine(node: TreeNode, hl: int, hr: int) -> Any:
+        if abs(hl - hr) > 1:
+            return _ABORT
+        return 1 + max(hl, hr)
+    return _fold_postorder(root, combine, -1) is not _ABORT
 
 
-def diameter(root: Optional[TreeNode]) -> int:
+def diameter(root: Optional[BinaryTree]) -> int:
     """Number of edges on the longest path between any two nodes."""
+    if isinstance(root, ArrayTree):
+        return root.diameter()
     best = 0
-    def dfs(node: Optional[TreeNode]) -> int:
+    def combine(node: TreeNode, hl: int, hr: int) -> int:
         nonlocal best
-        if not node:
-            return -1
-        hl = dfs(node.left)
-        hr = dfs(node.right)
         best = max(best, hl + hr + 2)
         return 1 + max(hl, hr)
-    dfs(root)
+    _fold_postorder(root, combine, -1)
     return best
 
 
 # --- Traversals ---------------------------------------------------------------
 
-def preorder_recursive(root: Optional[TreeNode]) -> List[Any]:
-    if not root:
-        return []
-    return [root.val] + preorder_recursive(root.left) + preorder_recursive(root.right)
+# The *_recursive names are kept for the textbook definitions they describe,
+#     preorder(node) = [node.val] + preorder(node.left) + preorder(node.right)
+# but they return the same lists via the explicit-stack versions below,
+# avoiding both RecursionError and the O(n * h) list concatenation.
 
+def preorder_recursive(root: Optional[BinaryTree]) -> List[Any]:
+    return preorder_iterative(root)
 
-def inorder_recursive(root: Optional[TreeNode]) -> List[Any]:
-    if not root:
-        return []
-    return inorder_recursive(root.left) + [root.val] + inorder_recursive(root.right)
 
+def inorder_recursive(root: Optional[BinaryTree]) -> List[Any]:
+    return inorder_iterative(root)
 
-def postorder_recursive(root: Optional[TreeNode]) -> List[Any]:
-    if not root:
-        return []
-    return postorder_recursive(root.left) + postorder_recursive(root.right) + [root.val]
+
+def postorder_recursive(root: Optional[BinaryTree]) -> List[Any]:
+    return postorder_iterative(root)
 
 
-def preorder_iterative(root: Optional[TreeNode]) -> List[Any]:
+def preorder_iterative(root: Optional[BinaryTree]) -> List[Any]:
+    if isinstance(root, ArrayTree):
+        return root.preorder()
     if not root:
         return []
     stack = [root]
@@ -192,7 +899,9 @@ def preorder_iterative(root: Optional[TreeNode]) -> List[Any]:
     return out
 
 
-def inorder_iterative(root: Optional[TreeNode]) -> List[Any]:
+def inorder_iterative(root: Optional[BinaryTree]) -> List[Any]:
+    if isinstance(root, ArrayTree):
+        return root.inorder()
     out: List[Any] = []
     stack: List[TreeNode] = []
     cur = root
@@ -206,7 +915,9 @@ def inorder_iterative(root: Optional[TreeNode]) -> List[Any]:
     return out
 
 
-def postorder_iterative(root: Optional[TreeNode]) -> List[Any]:
+def postorder_iterative(root: Optional[BinaryTree]) -> List[Any]:
+    if isinstance(root, ArrayTree):
+        return root.postorder()
     if not root:
         return []
     stack = [root]
@@ -221,7 +932,9 @@ def postorder_iterative(root: Optional[TreeNode]) -> List[Any]:
     return out[::-1]
 
 
-def level_order(root: Optional[TreeNode]) -> List[List[Any]]:
+def level_order(root: Optional[BinaryTree]) -> List[List[Any]]:
+    if isinstance(root, ArrayTree):
+        return root.levels()
     if not root:
         return []
     q: Deque[TreeNode] = deque([root])
@@ -240,7 +953,7 @@ def level_order(root: Optional[TreeNode]) -> List[List[Any]]:
     return levels
 
 
-def zigzag_level_order(root: Optional[TreeNode]) -> List[List[Any]]:
+def zigzag_level_order(root: Optional[BinaryTree]) -> List[List[Any]]:
     levels = level_order(root)
     for i in range(len(levels)):
         if i % 2 == 1:
@@ -248,60 +961,542 @@ def zigzag_level_order(root: Optional[TreeNode]) -> List[List[Any]]:
     return levels
 
 
+# --- Lazy traversals ----------------------------------------------------------
+# Generator versions of the traversals above: they hold only a stack/queue
+# (O(h) or O(width)), never the full output, and stop as soon as the caller does.
+
+def preorder_lazy(root: Optional[BinaryTree]) -> Generator[Any, None, None]:
+    if isinstance(root, ArrayTree):
+        yield from root.preorder_lazy()
+        return
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
+        yield node.val
+        if node.right:
+            stack.append(node.right)
+        if node.left:
+            stack.append(node.left)
+
+
+def inorder_lazy(root: Optional[BinaryTree]) -> Generator[Any, None, None]:
+    if isinstance(root, ArrayTree):
+        yield from root.inorder_lazy()
+        return
+    stack: List[TreeNode] = []
+    cur = root
+    while cur or stack:
+        while cur:
+            stack.append(cur)
+            cur = cur.left
+        cur = stack.pop()
+        yield cur.val
+        cur = cur.right
+
+
+def postorder_lazy(root: Optional[BinaryTree]) -> Generator[Any, None, None]:
+    """Single-stack postorder: a node is emitted once its right subtree is done."""
+    if isinstance(root, ArrayTree):
+        yield from root.postorder_lazy()
+        return
+    stack: List[TreeNode] = []
+    cur = root
+    last: Optional[TreeNode] = None
+    while cur or stack:
+        while cur:
+            stack.append(cur)
+            cur = cur.left
+        node = stack[-1]
+        if node.right and node.right is not last:
+            cur = node.right
+        else:
+            stack.pop()
+            yield node.val
+            last = node
+
+
+def level_order_lazy(root: Optional[BinaryTree]) -> Generator[List[Any], None, None]:
+    """Yield one list of values per level."""
+    if isinstance(root, ArrayTree):
+        yield from root.levels_lazy()
+        return
+    frontier = [root] if root else []
+    while frontier:
+        yield [node.val for node in frontier]
+        nxt: List[TreeNode] = []
+        for node in frontier:
+            if node.left:
+                nxt.append(node.left)
+            if node.right:
+                nxt.append(node.right)
+        frontier = nxt
+
+
+def zigzag_level_order_lazy(root: Optional[BinaryTree]) -> Generator[List[Any], None, None]:
+    for i, level in enumerate(level_order_lazy(root)):
+        if i % 2 == 1:
+            level.reverse()
+        yield level
+
+
+# Morris traversals thread each left subtree's rightmost node back to its
+# ancestor instead of keeping a stack, so they use O(1) extra memory. The tree
+# is temporarily modified while the generator runs (don't share it with other
+# readers meanwhile); every thread is removed again, also when the caller
+# stops early. They need mutable node objects: an ArrayTree raises TypeError
+# (its index arrays may be shared, e.g. by pickled copies or views), so use
+# inorder_lazy / preorder_lazy on it instead.
+
+def _morris_check(root: Any) -> None:
+    if isinstance(root, ArrayTree):
+        raise TypeError("Morris traversal threads TreeNode pointers and can't run on an "
+                        "ArrayTree; use inorder_lazy / preorder_lazy instead")
+
+def _morris_unthread(cur: Optional[TreeNode]) -> None:
+    """Remove the threads still pending when a Morris walk stops at cur.
+    They all hang off the chain of right pointers starting at cur."""
+    while cur:
+        if cur.left:
+            pred = cur.left
+            while pred.right and pred.right is not cur:
+                pred = pred.right
+            if pred.right is cur:
+                pred.right = None
+        cur = cur.right
+
+
+def morris_inorder(root: Optional[TreeNode]) -> Generator[Any, None, None]:
+    _morris_check(root)
+    cur = root
+    try:
+        while cur:
+            if not cur.left:
+                node, cur = cur, cur.right
+                yield node.val
+                continue
+            pred = cur.left
+            while pred.right and pred.right is not cur:
+                pred = pred.right
+            if pred.right is None:
+                pred.right = cur  # thread, then walk the left subtree
+                cur = cur.left
+            else:
+                pred.right = None  # left subtree done; unthread
+                node, cur = cur, cur.right
+                yield node.val
+    finally:
+        _morris_unthread(cur)
+
+
+def morris_preorder(root: Optional[TreeNode]) -> Generator[Any, None, None]:
+    _morris_check(root)
+    cur = root
+    try:
+        while cur:
+            if not cur.left:
+                node, cur = cur, cur.right
+                yield node.val
+                continue
+            pred = cur.left
+            while pred.right and pred.right is not cur:
+                pred = pred.right
+            if pred.right is None:
+                pred.right = cur
+                node, cur = cur, cur.left
+                yield node.val
+            else:
+                pred.right = None
+                cur = cur.right
+    finally:
+        _morris_unthread(cur)
+
+
 # --- Paths & sums -------------------------------------------------------------
 
 def root_to_leaf_paths(root: Optional[TreeNode]) -> List[List[Any]]:
     out: List[List[Any]] = []
-    def dfs(node: Optional[TreeNode], path: List[Any]) -> None:
-        if not node:
-            return
+    path: List[Any] = []
+    # Parallel stacks: node to visit and the path length above it.
+    nodes = [root] if root else []
+    depths = [0]
+    while nodes:
+        node = nodes.pop()
+        del path[depths.pop():]
         path.append(node.val)
         if not node.left and not node.right:
             out.append(path.copy())
-        else:
-            dfs(node.left, path)
-            dfs(node.right, path)
-        path.pop()
-    dfs(root, [])
+            continue
+        for child in (node.right, node.left):
+            if child:
+                nodes.append(child)
+                depths.append(len(path))
     return out
 
 
-def has_path_sum(root: Optional[TreeNode], target_sum: int) -> bool:
-    if not root:
-        return False
-    if not root.left and not root.right:
-        return target_sum == root.val
-    return has_path_sum(root.left, target_sum - root.val) or \
-           has_path_sum(root.right, target_sum - root.val)
+def has_path_sum(root: Optional[BinaryTree], target_sum: int) -> bool:
+    if isinstance(root, ArrayTree):
+        return root.has_path_sum(target_sum)
+    nodes = [root] if root else []
+    remaining = [target_sum]  # parallel to nodes
+    while nodes:
+        node = nodes.pop()
+        rest = remaining.pop() - node.val
+        if not node.left and not node.right:
+            if rest == 0:
+                return True
+            continue
+        for child in (node.right, node.left):
+            if child:
+                nodes.append(child)
+                remaining.append(rest)
+    return False
 
 
 # --- Lowest Common Ancestor ---------------------------------------------------
 
 def lca_binary_tree(root: Optional[TreeNode], p: TreeNode, q: TreeNode) -> Optional[TreeNode]:
-    if not root or root is p or root is q:
-        return root
-    left = lca_binary_tree(root.left, p, q)
-    right = lca_binary_tree(root.right, p, q)
-    if left and right:
-        return root
-    return left or right
+    def combine(node: TreeNode, left: Optional[TreeNode], right: Optional[TreeNode]) -> Optional[TreeNode]:
+        if node is p or node is q or (left and right):
+            return node
+        return left or right
+    return _fold_postorder(root, combine, None)
+
+
+class LCAIndex:
+    """Answer many LCA queries on a static tree in O(1) each after an O(n) build.
+
+    Uses the DFS-order trick: with u visited before v (preorder positions
+    tin[u] < tin[v]), LCA(u, v) is the shallowest parent among the nodes at
+    positions (tin[u], tin[v]]. Position i stores that parent as one packed
+    key (depth << 32 | parent position) so a plain min() finds it. Range
+    minimums use 32-element blocks: a sparse table over block minima plus
+    C-level min() over the two partial blocks, which keeps memory ~O(n).
+
+    Works on TreeNode trees (query with node objects, returns a node) and on
+    ArrayTree (query with node indices, returns an index). The tree must not
+    change after the index is built.
+    """
+    BLOCK = 32
+
+    def __init__(self, root: Optional[BinaryTree]):
+        self.order: List[Any] = []  # preorder position -> node (TreeNode or index)
+        self.keys = array("q")
+        self._array = isinstance(root, ArrayTree)
+        if self._array:
+            self._tin: Any = array("q", [NIL]) * len(root)
+        else:
+            self._tin = {}
+        self._build_order(root)
+        blocks = [min(self.keys[i:i + self.BLOCK]) for i in range(0, len(self.keys), self.BLOCK)]
+        self.table: List[List[int]] = [blocks]
+        k = 1
+        while 2 * k <= len(blocks):
+            prev = self.table[-1]
+            self.table.append(list(map(min, prev[:len(prev) - k], prev[k:])))
+            k *= 2
+
+    def _build_order(self, root: Optional[BinaryTree]) -> None:
+        order, keys, tin = self.order, self.keys, self._tin
+        if self._array:
+            if root.root == NIL:
+                return
+            left, right = root.left, root.right
+            stack = [(root.root, 0, -1)]
+            while stack:
+                node, depth, parent = stack.pop()
+                tin[node] = len(order)
+                keys.append(((depth - 1) << 32) | parent if parent >= 0 else 1 << 62)
+                order.append(node)
+                here = tin[node]
+                if right[node] != NIL:
+                    stack.append((right[node], depth + 1, here))
+                if left[node] != NIL:
+                    stack.append((left[node], depth + 1, here))
+            return
+        stack = [(root, 0, -1)] if root else []
+        while stack:
+            node, depth, parent = stack.pop()
+            here = len(order)
+            tin[id(node)] = here
+            keys.append(((depth - 1) << 32) | parent if parent >= 0 else 1 << 62)
+            order.append(node)
+            if node.right:
+                stack.append((node.right, depth + 1, here))
+            if node.left:
+                stack.append((node.left, depth + 1, here))
+
+    def _pos(self, node: Any) -> int:
+        pos = self._tin[node] if self._array else self._tin.get(id(node), NIL)
+        if pos == NIL:
+            raise KeyError(f"{node!r} is not in the indexed tree")
+        return pos
+
+    def _range_min(self, a: int, b: int) -> int:
+        """min(keys[a..b]) inclusive."""
+        keys, B = self.keys, self.BLOCK
+        ba, bb = a // B, b // B
+        if ba == bb:
+            return min(keys[a:b + 1])
+        m = min(min(keys[a:(ba + 1) * B]), min(keys[bb * B:b + 1]))
+        if bb - ba > 1:
+            k = (bb - ba - 1).bit_length() - 1
+            row = self.table[k]
+            m = min(m, row[ba + 1], row[bb - (1 << k)])
+        return m
+
+    def query(self, p: Any, q: Any) -> Any:
+        u, v = self._pos(p), self._pos(q)
+        if u == v:
+            return self.order[u]
+        if u > v:
+            u, v = v, u
+        return self.order[self._range_min(u + 1, v) & 0xFFFFFFFF]
+
+    def query_many(self, pairs: Iterable[Tuple[Any, Any]]) -> List[Any]:
+        query = self.query
+        return [query(p, q) for p, q in pairs]
+
+
+# --- Forests: process-pool aggregation ---------------------------------------
+
+FOREST_OPS: dict[str, Callable[[ArrayTree], Any]] = {
+    "size": size,
+    "height": height,
+    "diameter": diameter,
+}
+
+
+def _forest_chunk(trees: List[ArrayTree], ops: Tuple[str, ...], target_sum: Any) -> List[dict]:
+    """Worker side of forest_stats: one result dict per tree."""
+    fns = [(name, FOREST_OPS[name]) for name in ops]
+    out = []
+    for tree in trees:
+        res = {name: fn(tree) for name, fn in fns}
+        if target_sum is not None:
+            res["has_path_sum"] = tree.has_path_sum(target_sum)
+        out.append(res)
+    return out
+
+
+def forest_stats(trees: Iterable[Optional[BinaryTree]], ops: Iterable[str] = ("size", "height", "diameter"),
+                 target_sum: Any = None, workers: Optional[int] = None, chunksize: int = 256) -> List[dict]:
+    """Compute per-tree stats over a forest, spread across worker processes.
+
+    Returns one dict per input tree, in input order, with a key per name in
+    `ops` (see FOREST_OPS) plus "has_path_sum" when target_sum is given.
+
+    Trees travel to the workers as ArrayTrees, whose index arrays pickle as
+    raw bytes; pass ArrayTrees (e.g. build_tree_from_level_list(..., compact=True),
+    ideally with a numeric typecode) to skip the conversion of TreeNode trees
+    in this process. Trees are sent in chunks of `chunksize` to amortise IPC.
+    workers=1 runs everything in this process; None uses os.cpu_count().
+    """
+    ops = tuple(ops)
+    unknown = [name for name in ops if name not in FOREST_OPS]
+    if unknown:
+        raise ValueError(f"unknown forest ops {unknown}; choose from {sorted(FOREST_OPS)}")
+    packed = [t if isinstance(t, ArrayTree) else ArrayTree.from_treenode(t) for t in trees]
+    chunks = [packed[i:i + chunksize] for i in range(0, len(packed), chunksize)]
+    if workers == 1 or len(chunks) <= 1:
+        return [res for chunk in chunks for res in _forest_chunk(chunk, ops, target_sum)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = pool.map(_forest_chunk, chunks, itertools.repeat(ops), itertools.repeat(target_sum))
+        return [res for part in parts for res in part]
 
 
 # =============================================================
 # 2) Binary Search Tree (BST)
 # =============================================================
 
+@dataclass(repr=False)
+class BSTNode(TreeNode):
+    """TreeNode plus the bookkeeping BST keeps on every node it creates."""
+    height: int = 0
+    size: int = 1
+
+
+def _h(node: Optional[BSTNode]) -> int:
+    return node.height if node else -1
+
+
+def _sz(node: Optional[BSTNode]) -> int:
+    return node.size if node else 0
+
+
+def _skewed(node: BSTNode) -> bool:
+    """True if node's children differ in height by more than one."""
+    return abs(_h(node.left) - _h(node.right)) > 1
+
+
 class BST:
-    def __init__(self, root: Optional[TreeNode] = None):
+    """Binary search tree without duplicates.
+
+    With balanced=True the tree is kept AVL-balanced on every insert and
+    delete, so search/insert/delete stay O(log n) even for sorted input.
+    Every node also tracks its subtree size and height, kept current on the
+    insert/delete path, which makes len(), height() and is_balanced() O(1)
+    and the order-statistic queries (kth_smallest, rank, count_in_range) O(h).
+    split/join cut and glue trees at a key in O(h) (O(log n) when balanced);
+    delete_range is built on them, removing a whole key range at that cost.
+    """
+
+    def __init__(self, root: Optional[TreeNode] = None, balanced: bool = False):
+        self.balanced = balanced
+        # Number of nodes violating the height-balance rule; always 0 when
+        # balanced, None when unknown (after a split/join of a plain tree).
+        self._skewed: Optional[int] = 0
+        if root is not None:
+            # Plain TreeNodes carry no sizes/heights: copy them into BSTNodes,
+            # rebuilding balanced when the AVL invariant is required.
+            root = self._build_sorted(inorder_iterative(root)) if balanced else self._adopt(root)
+            if not balanced:
+                self._skewed = self._count_skewed(root)
         self.root = root
 
     @staticmethod
-    def from_iterable(vals: Iterable[Any]) -> 'BST':
-        bst = BST()
+    def _count_skewed(root: Optional[BSTNode]) -> int:
+        count = 0
+        stack = [root] if root else []
+        while stack:
+            node = stack.pop()
+            count += _skewed(node)
+            stack.extend(c for c in (node.left, node.right) if c)
+        return count
+
+    @staticmethod
+    def _adopt(root: TreeNode) -> BSTNode:
+        """Copy a TreeNode tree into BSTNodes of the same shape."""
+        copies: dict[int, BSTNode] = {}
+        stack: List[Tuple[TreeNode, bool]] = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done:
+                copy = BSTNode(node.val,
+                               copies.pop(id(node.left)) if node.left else None,
+                               copies.pop(id(node.right)) if node.right else None)
+                BST._update(copy)
+                copies[id(node)] = copy
+                continue
+            stack.append((node, True))
+            if node.right:
+                stack.append((node.right, False))
+            if node.left:
+                stack.append((node.left, False))
+        return copies[id(root)]
+
+    @staticmethod
+    def from_iterable(vals: Iterable[Any], balanced: bool = False) -> 'BST':
+        bst = BST(balanced=balanced)
         for v in vals:
             bst.insert(v)
         return bst
 
+    @staticmethod
+    def from_sorted(vals: Iterable[Any], balanced: bool = False) -> 'BST':
+        """Build a perfectly balanced BST from ascending values in O(n).
+        Duplicates are dropped; unsorted input raises ValueError."""
+        keys: List[Any] = []
+        for v in vals:
+            if keys and v <= keys[-1]:
+                if v == keys[-1]:
+                    continue
+                raise ValueError("from_sorted needs ascending input")
+            keys.append(v)
+        bst = BST(balanced=balanced)
+        bst.root = BST._build_sorted(keys)
+        return bst
+
+    @staticmethod
+    def _build_sorted(keys: List[Any]) -> Optional[BSTNode]:
+        def build(lo: int, hi: int) -> Optional[BSTNode]:
+            if lo > hi:
+                return None
+            mid = (lo + hi) // 2
+            node = BSTNode(keys[mid], build(lo, mid - 1), build(mid + 1, hi))
+            BST._update(node)
+            return node
+        return build(0, len(keys) - 1)
+
+    # --- Bookkeeping and AVL machinery (rotations only when self.balanced) ---
+
+    @staticmethod
+    def _update(node: BSTNode) -> None:
+        node.height = 1 + max(_h(node.left), _h(node.right))
+        node.size = 1 + _sz(node.left) + _sz(node.right)
+
+    @staticmethod
+    def _rotate_right(y: BSTNode) -> BSTNode:
+        x = y.left
+        y.left = x.right
+        x.right = y
+        BST._update(y)
+        BST._update(x)
+        return x
+
+    @staticmethod
+    def _rotate_left(x: BSTNode) -> BSTNode:
+        y = x.right
+        x.right = y.left
+        y.left = x
+        BST._update(x)
+        BST._update(y)
+        return y
+
+    def _rebalance(self, node: BSTNode) -> BSTNode:
+        """Refresh node's bookkeeping, restore the AVL invariant (when balanced)
+        and return the new subtree root."""
+        self._update(node)
+        if not self.balanced:
+            return node
+        bf = _h(node.left) - _h(node.right)
+        if bf > 1:
+            if _h(node.left.left) < _h(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if bf < -1:
+            if _h(node.right.right) < _h(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+
+    def _retrace(self, path: List[BSTNode]) -> BSTNode:
+        """Refresh bookkeeping and rebalance bottom-up along a downward path
+        after a structural change; return the new root of path[0]'s subtree."""
+        top = path[0]
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            new = self._rebalance(node)
+            if new is node:
+                continue
+            if i == 0:
+                top = new
+            elif path[i - 1].left is node:
+                path[i - 1].left = new
+            else:
+                path[i - 1].right = new
+        return top
+
+    def _fix_heights(self, path: List[BSTNode], old: int, left: bool) -> None:
+        """Unbalanced-mode retrace: path[-1]'s left (or right) child just changed
+        height from `old`. Push the change upward, keeping _skewed current, and
+        stop at the first ancestor whose height is unaffected."""
+        delta = 0
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            if left:
+                new, other = _h(node.left), _h(node.right)
+            else:
+                new, other = _h(node.right), _h(node.left)
+            delta += (abs(new - other) > 1) - (abs(old - other) > 1)
+            h = 1 + (new if new > other else other)
+            if h == node.height:
+                break
+            old, node.height = node.height, h
+            if i:
+                left = path[i - 1].left is node
+        if self._skewed is not None:
+            self._skewed += delta
+
     def search(self, key: Any) -> Optional[TreeNode]:
         cur = self.root
         while cur:
@@ -312,75 +1507,431 @@ class BST:
 
     def insert(self, key: Any) -> None:
         if not self.root:
-            self.root = TreeNode(key)
+            self.root = BSTNode(key)
             return
         cur = self.root
+        path: List[BSTNode] = []
         while True:
+            path.append(cur)
             if key < cur.val:
                 if cur.left:
                     cur = cur.left
                 else:
-                    cur.left = TreeNode(key)
-                    return
+                    cur.left = BSTNode(key)
+                    break
             elif key > cur.val:
                 if cur.right:
                     cur = cur.right
                 else:
-                    cur.right = TreeNode(key)
-                    return
+                    cur.right = BSTNode(key)
+                    break
             else:
                 return  # no duplicates
+        if self.balanced:
+            self.root = self._retrace(path)
+            return
+        for node in path:
+            node.size += 1
+        self._fix_heights(path, -1, key < path[-1].val)
 
     def _delete(self, node: Optional[TreeNode], key: Any) -> Optional[TreeNode]:
-        if not node:
-            return None
-        if key < node.val:
-            node.left = self._delete(node.left, key)
-        elif key > node.val:
-            node.right = self._delete(node.right, key)
-        else:
-            # Found node: cases 0/1/2 children
-            if not node.left:
-                return node.right
-            if not node.right:
-                return node.left
-            # Two children: promote inorder successor
-            succ_parent = node
-            succ = node.right
+        """Remove key from the subtree rooted at node; return the new subtree root."""
+        path: List[BSTNode] = []
+        cur = node
+        while cur and key != cur.val:
+            path.append(cur)
+            cur = cur.left if key < cur.val else cur.right
+        if not cur:
+            return node  # key absent: nothing changes
+        if cur.left and cur.right:
+            # Two children: promote inorder successor, then unlink the successor instead
+            path.append(cur)
+            succ = cur.right
             while succ.left:
-                succ_parent = succ
+                path.append(succ)
                 succ = succ.left
-            node.val = succ.val
-            if succ_parent.left is succ:
-                succ_parent.left = succ.right
-            else:
-                succ_parent.right = succ.right
+            cur.val = succ.val
+            cur = succ
+        # cur now has at most one child
+        replacement = cur.left or cur.right
+        if not self.balanced and self._skewed is not None:
+            self._skewed -= _skewed(cur)
+        if not path:
+            return replacement
+        parent = path[-1]
+        was_left = parent.left is cur
+        if was_left:
+            parent.left = replacement
+        else:
+            parent.right = replacement
+        if self.balanced:
+            return self._retrace(path)
+        for p in path:
+            p.size -= 1
+        self._fix_heights(path, cur.height, was_left)
         return node
 
     def delete(self, key: Any) -> None:
         self.root = self._delete(self.root, key)
 
-    def kth_smallest(self, k: int) -> Any:
-        stack: List[TreeNode] = []
+    def __len__(self) -> int:
+        return _sz(self.root)
+
+    def height(self) -> int:
+        """Edges on the longest root-to-leaf path (-1 when empty), in O(1)."""
+        return _h(self.root)
+
+    def is_balanced(self) -> bool:
+        """Whether every node's subtrees differ in height by at most one, in O(1)
+        (the first call after split/join on a plain tree recounts in O(n))."""
+        if self._skewed is None:
+            self._skewed = self._count_skewed(self.root)
+        return self._skewed == 0
+
+    # --- Range queries, split and join ---
+
+    def range(self, lo: Any, hi: Any) -> Generator[Any, None, None]:
+        """Lazily yield the keys k with lo <= k <= hi in ascending order,
+        touching only the O(h + k) nodes on the way."""
+        stack: List[BSTNode] = []
         cur = self.root
         while True:
             while cur:
-                stack.append(cur)
+                if cur.val < lo:
+                    cur = cur.right  # cur and its left subtree are all below lo
+                else:
+                    stack.append(cur)
+                    cur = cur.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.val > hi:
+                return
+            yield node.val
+            cur = node.right
+
+    @staticmethod
+    def _own(node: BSTNode) -> BSTNode:
+        """The node to relink in place of `node`. PersistentBST returns a copy."""
+        return node
+
+    def _join3(self, left: Optional[BSTNode], node: BSTNode, right: Optional[BSTNode]) -> BSTNode:
+        """Hang left and right under node (keys in left < node.val < keys in
+        right) and return the root of the result. AVL trees descend the
+        taller side's spine to a subtree of matching height, splice node in
+        there and rebalance upward: O(|height difference|)."""
+        if not self.balanced or abs(_h(left) - _h(right)) <= 1:
+            node.left, node.right = left, right
+            self._update(node)
+            return node
+        tall_left = _h(left) > _h(right)
+        short = right if tall_left else left
+        path: List[BSTNode] = []
+        cur = left if tall_left else right
+        while _h(cur) > _h(short) + 1:
+            cur = self._own(cur)
+            if path:
+                if tall_left:
+                    path[-1].right = cur
+                else:
+                    path[-1].left = cur
+            path.append(cur)
+            cur = cur.right if tall_left else cur.left
+        if tall_left:
+            node.left, node.right = cur, right
+            path[-1].right = node
+        else:
+            node.left, node.right = left, cur
+            path[-1].left = node
+        self._update(node)
+        return self._retrace(path)
+
+    def _pop_min(self, root: BSTNode) -> Tuple[BSTNode, Optional[BSTNode]]:
+        """Unlink the smallest node of a subtree; return (that node, new subtree root)."""
+        path: List[BSTNode] = []
+        cur = root
+        while cur.left:
+            cur = self._own(cur)
+            if path:
+                path[-1].left = cur
+            path.append(cur)
+            cur = cur.left
+        if not path:
+            return cur, cur.right
+        path[-1].left = cur.right
+        return cur, self._retrace(path)
+
+    def _split(self, root: Optional[BSTNode], key: Any, inclusive: bool) -> Tuple[Optional[BSTNode], Optional[BSTNode]]:
+        """Split a subtree into (keys < key, keys >= key), or (keys <= key,
+        keys > key) when inclusive. Walks one search path, then rejoins the
+        pieces bottom-up; for AVL trees the joins telescope to O(log n)."""
+        path: List[Tuple[BSTNode, bool]] = []
+        cur = root
+        while cur:
+            goes_right = key < cur.val or (key == cur.val and not inclusive)
+            path.append((cur, goes_right))
+            cur = cur.left if goes_right else cur.right
+        low: Optional[BSTNode] = None
+        high: Optional[BSTNode] = None
+        for node, goes_right in reversed(path):
+            owned = self._own(node)
+            if goes_right:
+                high = self._join3(high, owned, node.right)
+            else:
+                low = self._join3(node.left, owned, low)
+        return low, high
+
+    def _join2(self, low: Optional[BSTNode], high: Optional[BSTNode]) -> Optional[BSTNode]:
+        if not low or not high:
+            return low or high
+        mid, high = self._pop_min(high)
+        return self._join3(low, self._own(mid), high)
+
+    def split(self, key: Any) -> 'BST':
+        """Move every key >= key into a new tree of the same kind and return it;
+        this tree keeps the keys < key."""
+        low, high = self._split(self.root, key, inclusive=False)
+        other = copy.copy(self)
+        self.root, other.root = low, high
+        if not self.balanced:
+            self._skewed = other._skewed = None
+        return other
+
+    def join(self, other: 'BST') -> None:
+        """Append every key of `other` (all must be greater than this tree's
+        keys) to this tree in O(log n) for AVL trees; `other` is emptied."""
+        if self.root and other.root:
+            top = self.root
+            while top.right:
+                top = top.right
+            low = other.root
+            while low.left:
+                low = low.left
+            if not top.val < low.val:
+                raise ValueError("join needs every key of other to be greater than this tree's keys")
+        self.root = self._join2(self.root, other.root)
+        other.root = None
+        if not self.balanced:
+            self._skewed = None
+        other._skewed = 0
+
+    def delete_range(self, lo: Any, hi: Any) -> int:
+        """Delete every key k with lo <= k <= hi; return how many were removed."""
+        if hi < lo:
+            return 0
+        low, rest = self._split(self.root, lo, inclusive=False)
+        mid, high = self._split(rest, hi, inclusive=True)
+        self.root = self._join2(low, high)
+        if not self.balanced:
+            self._skewed = None
+        return _sz(mid)
+
+    def kth_smallest(self, k: int) -> Any:
+        """Return the k-th smallest key (1-based) in O(h)."""
+        if not 1 <= k <= _sz(self.root):
+            raise IndexError(f"k={k} out of range for BST of size {_sz(self.root)}")
+        cur = self.root
+        while True:
+            left = _sz(cur.left)
+            if k <= left:
                 cur = cur.left
-            cur = stack.pop()
-            k -= 1
-            if k == 0:
+            elif k == left + 1:
                 return cur.val
-            cur = cur.right
+            else:
+                k -= left + 1
+                cur = cur.right
 
-    def validate_bst(self) -> bool:
-        def dfs(node: Optional[TreeNode], low: Any, high: Any) -> bool:
+    def _count_below(self, key: Any, inclusive: bool) -> int:
+        cur = self.root
+        count = 0
+        while cur:
+            if key < cur.val or (key == cur.val and not inclusive):
+                cur = cur.left
+            else:
+                count += _sz(cur.left) + 1
+                if key == cur.val:
+                    break
+                cur = cur.right
+        return count
+
+    def rank(self, key: Any) -> int:
+        """Number of keys strictly smaller than key (its 0-based sorted position)."""
+        return self._count_below(key, inclusive=False)
+
+    def count_in_range(self, lo: Any, hi: Any) -> int:
+        """Number of keys k with lo <= k <= hi."""
+        if hi < lo:
+            return 0
+        return self._count_below(hi, inclusive=True) - self._count_below(lo, inclusive=False)
+
+    def select_many(self, ks: List[int]) -> List[Any]:
+        """kth_smallest for many k at once. Queries are sorted and pushed down
+        the tree together, so shared path prefixes are walked only once."""
+        n = _sz(self.root)
+        for k in ks:
+            if not 1 <= k <= n:
+                raise IndexError(f"k={k} out of range for BST of size {n}")
+        order = sorted(range(len(ks)), key=ks.__getitem__)
+        sorted_ks = [ks[i] for i in order]
+        out: List[Any] = [None] * len(ks)
+        # (subtree, query slice [lo, hi), number of keys ordered before the subtree)
+        stack = [(self.root, 0, len(ks), 0)]
+        while stack:
+            node, lo, hi, before = stack.pop()
+            if lo >= hi:
+                continue
+            k_here = before + _sz(node.left) + 1
+            mid = bisect.bisect_left(sorted_ks, k_here, lo, hi)
+            end = bisect.bisect_right(sorted_ks, k_here, mid, hi)
+            for j in range(mid, end):
+                out[order[j]] = node.val
+            stack.append((node.left, lo, mid, before))
+            stack.append((node.right, end, hi, k_here))
+        return out
+
+    def rank_many(self, keys: List[Any]) -> List[int]:
+        """rank() for many keys at once (see select_many)."""
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_keys = [keys[i] for i in order]
+        out = [0] * len(keys)
+        stack = [(self.root, 0, len(keys), 0)]
+        while stack:
+            node, lo, hi, before = stack.pop()
+            if lo >= hi:
+                continue
             if not node:
-                return True
-            if (low is not None and node.val <= low) or (high is not None and node.val >= high):
+                for j in range(lo, hi):
+                    out[order[j]] = before
+                continue
+            mid = bisect.bisect_left(sorted_keys, node.val, lo, hi)
+            end = bisect.bisect_right(sorted_keys, node.val, mid, hi)
+            for j in range(mid, end):
+                out[order[j]] = before + _sz(node.left)
+            stack.append((node.left, lo, mid, before))
+            stack.append((node.right, end, hi, before + _sz(node.left) + 1))
+        return out
+
+    def validate_bst(self) -> bool:
+        """A tree is a valid (duplicate-free) BST iff its inorder walk is strictly increasing."""
+        it = inorder_lazy(self.root)
+        prev = next(it, None)
+        for val in it:
+            if val <= prev:
                 return False
-            return dfs(node.left, low, node.val) and dfs(node.right, node.val, high)
-        return dfs(self.root, None, None)
+            prev = val
+        return True
+
+
+
+def _clone(node: BSTNode) -> BSTNode:
+    return BSTNode(node.val, node.left, node.right, node.height, node.size)
+
+
+class PersistentBST(BST):
+    """AVL-balanced BST whose updates never modify an existing node.
+
+    insert/delete copy only the O(log n) nodes on the search path (plus the
+    few a rotation touches), build the new version beside the old one, and
+    publish it with a single assignment to self.root. Every older root is
+    therefore a complete, immutable tree that shares all untouched subtrees
+    with the newer versions.
+
+    snapshot() hands out such a version in O(1). Readers can search, iterate
+    (inorder_lazy(snap.root)) or run order-statistic queries on it from other
+    threads without locks while the writer keeps going. All the read-only
+    BST methods work on a PersistentBST or a snapshot unchanged.
+    """
+
+    def __init__(self, root: Optional[TreeNode] = None):
+        super().__init__(root, balanced=True)
+
+    @classmethod
+    def from_iterable(cls, vals: Iterable[Any]) -> 'PersistentBST':
+        tree = cls()
+        for v in vals:
+            tree.insert(v)
+        return tree
+
+    @classmethod
+    def from_sorted(cls, vals: Iterable[Any]) -> 'PersistentBST':
+        tree = cls()
+        tree.root = BST.from_sorted(vals).root
+        return tree
+
+    # split/join relink nodes on their search paths: work on copies instead.
+    _own = staticmethod(_clone)
+
+    def snapshot(self) -> 'PersistentBST':
+        """The current version as its own tree, in O(1). Updating the snapshot
+        branches off a new version; it never affects this tree."""
+        snap = PersistentBST()
+        snap.root = self.root
+        return snap
+
+    # Rotations relink their two nodes; copy them first, since either may be
+    # shared with older versions.
+    @staticmethod
+    def _rotate_right(y: BSTNode) -> BSTNode:
+        y = _clone(y)
+        y.left = _clone(y.left)
+        return BST._rotate_right(y)
+
+    @staticmethod
+    def _rotate_left(x: BSTNode) -> BSTNode:
+        x = _clone(x)
+        x.right = _clone(x.right)
+        return BST._rotate_left(x)
+
+    def _copy_path(self, path: List[BSTNode], key: Any, child: Optional[BSTNode]) -> Optional[BSTNode]:
+        """Rebuild path (root first) bottom-up as fresh copies, hanging `child`
+        where the search for key left the last node; return the new root."""
+        for node in reversed(path):
+            dup = _clone(node)
+            if key < node.val:
+                dup.left = child
+            else:
+                dup.right = child
+            child = self._rebalance(dup)
+        return child
+
+    def insert(self, key: Any) -> Optional[BSTNode]:
+        """Insert key and return the new version's root (unchanged if present)."""
+        path: List[BSTNode] = []
+        cur = self.root
+        while cur:
+            if key == cur.val:
+                return self.root
+            path.append(cur)
+            cur = cur.left if key < cur.val else cur.right
+        self.root = self._copy_path(path, key, BSTNode(key))
+        return self.root
+
+    def delete(self, key: Any) -> Optional[BSTNode]:
+        """Delete key and return the new version's root (unchanged if absent)."""
+        path: List[BSTNode] = []
+        cur = self.root
+        while cur and key != cur.val:
+            path.append(cur)
+            cur = cur.left if key < cur.val else cur.right
+        if not cur:
+            return self.root
+        if cur.left and cur.right:
+            # Cut the inorder successor out of a copy of the right subtree,
+            # then let a copy of cur take over its value.
+            succ_path: List[BSTNode] = []
+            succ = cur.right
+            while succ.left:
+                succ_path.append(succ)
+                succ = succ.left
+            right = self._copy_path(succ_path, succ.val, succ.right)
+            replacement = _clone(cur)
+            replacement.val = succ.val
+            replacement.right = right
+            replacement = self._rebalance(replacement)
+        else:
+            replacement = cur.left or cur.right
+        self.root = self._copy_path(path, key, replacement)
+        return self.root
 
 
 # =============================================================
@@ -396,19 +1947,36 @@ class NaryNode:
         return f"NaryNode({self.val!r})"
 
 
-def nary_dfs(root: Optional[NaryNode]) -> List[Any]:
+def nary_dfs(root: Optional[NaryTree]) -> List[Any]:
+    if isinstance(root, CSRTree):
+        return root.dfs()
     out: List[Any] = []
-    def dfs(node: Optional[NaryNode]):
-        if not node:
-            return
+    stack = [root] if root else []
+    while stack:
+        node = stack.pop()
         out.append(node.val)
-        for c in node.children:
-            dfs(c)
-    dfs(root)
+        stack.extend(reversed(node.children))
     return out
 
 
-def nary_bfs(root: Optional[NaryNode]) -> List[Any]:
+def nary_bfs_lazy(root: Optional[NaryTree]) -> Generator[Any, None, None]:
+    if isinstance(root, CSRTree):
+        # One frontier at a time, so memory stays O(width) and an early stop is cheap.
+        vals = root.vals
+        for frontier in root.frontiers():
+            for i in frontier:
+                yield vals[i]
+        return
+    q: Deque[NaryNode] = deque([root] if root else [])
+    while q:
+        node = q.popleft()
+        yield node.val
+        q.extend(node.children)
+
+
+def nary_bfs(root: Optional[NaryTree]) -> List[Any]:
+    if isinstance(root, CSRTree):
+        return root.bfs()
     if not root:
         return []
     q: Deque[NaryNode] = deque([root])
@@ -421,44 +1989,250 @@ def nary_bfs(root: Optional[NaryNode]) -> List[Any]:
     return out
 
 
+class CSRTree:
+    """An N-ary tree in compressed-sparse-row form: three flat arrays instead
+    of one NaryNode (and one child list) per node.
+
+    Node i has value `vals[i]` and children `children[offsets[i]:offsets[i + 1]]`,
+    in order. Trees built by from_nary are numbered in BFS order, so every
+    level is one contiguous slice and level-synchronous BFS is pure slicing;
+    from_parents keeps the caller's node ids.
+
+    nary_dfs / nary_bfs / nary_bfs_lazy accept a CSRTree wherever they accept
+    a NaryNode root.
+    """
+    __slots__ = ("vals", "offsets", "children", "root", "bfs_numbered")
+
+    def __init__(self, vals: Any, offsets: Any, children: Any, root: int = NIL, bfs_numbered: bool = False):
+        self.vals = vals
+        self.offsets = offsets
+        self.children = children
+        self.root = root
+        self.bfs_numbered = bfs_numbered
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __repr__(self) -> str:
+        return f"CSRTree(size={len(self)})"
+
+    @classmethod
+    def from_parents(cls, parents: Any, vals: Optional[Iterable[Any]] = None,
+                     typecode: Optional[str] = None) -> 'CSRTree':
+        """Build from a parent array: parents[i] is node i's parent, -1 for the root.
+        Siblings are ordered by node id. vals defaults to the node ids themselves."""
+        n = len(parents)
+        vals = range(n) if vals is None else vals
+        vals = array(typecode, vals) if typecode else list(vals)
+        if len(vals) != n:
+            raise ValueError(f"got {len(vals)} values for {n} nodes")
+        if n == 0:
+            return cls(vals, array("q", [0]), array("q"))
+        counts = Counter(parents)
+        if counts.get(NIL) != 1:
+            raise ValueError("parents must contain exactly one root (-1)")
+        if min(parents) < NIL or max(parents) >= n:
+            raise ValueError("parent index out of range")
+        # A stable sort by parent groups siblings in id order; the root (parent -1)
+        # sorts first and is dropped, leaving exactly the CSR child array.
+        children = array("q", sorted(range(n), key=parents.__getitem__))
+        root = children[0]
+        del children[0]
+        offsets = array("q", itertools.accumulate(map(counts.get, range(n), itertools.repeat(0)), initial=0))
+        tree = cls(vals, offsets, children, root)
+        if sum(map(len, tree.frontiers())) != n:
+            raise ValueError("parents contain a cycle")
+        return tree
+
+    @classmethod
+    def from_nary(cls, root: Optional[NaryNode], typecode: Optional[str] = None) -> 'CSRTree':
+        order = [root] if root else []
+        for node in order:  # BFS: the list grows while we walk it
+            order.extend(node.children)
+        vals = [node.val for node in order]
+        offsets = array("q", itertools.accumulate((len(node.children) for node in order), initial=0))
+        return cls(array(typecode, vals) if typecode else vals, offsets,
+                   array("q", range(1, len(order))), 0 if order else NIL, bfs_numbered=True)
+
+    def to_nary(self) -> Optional[NaryNode]:
+        if self.root == NIL:
+            return None
+        nodes = [NaryNode(v, []) for v in self.vals]
+        get, offsets, children = nodes.__getitem__, self.offsets, self.children
+        for i, node in enumerate(nodes):
+            node.children = list(map(get, children[offsets[i]:offsets[i + 1]]))
+        return nodes[self.root]
+
+    def child_ids(self, i: int) -> Any:
+        return self.children[self.offsets[i]:self.offsets[i + 1]]
+
+    def dfs(self) -> List[Any]:
+        vals, offsets, children = self.vals, self.offsets, self.children
+        out: List[Any] = []
+        stack = [self.root] if self.root != NIL else []
+        while stack:
+            i = stack.pop()
+            out.append(vals[i])
+            stack.extend(reversed(children[offsets[i]:offsets[i + 1]]))
+        return out
+
+    def frontiers(self) -> Generator[Any, None, None]:
+        """Yield each BFS level as an array of node ids, built a whole level at a time."""
+        if self.root == NIL:
+            return
+        offsets, children = self.offsets, self.children
+        frontier = array("q", [self.root])
+        while frontier:
+            yield frontier
+            if self.bfs_numbered:
+                # Ids in a level are consecutive, so the next level is one slice.
+                frontier = children[offsets[frontier[0]]:offsets[frontier[-1] + 1]]
+            else:
+                starts = map(offsets.__getitem__, frontier)
+                ends = map(offsets.__getitem__, map((1).__add__, frontier))
+                frontier = array("q", itertools.chain.from_iterable(
+                    map(children.__getitem__, map(slice, starts, ends))))
+
+    def levels(self) -> List[List[Any]]:
+        vals = self.vals
+        if self.bfs_numbered:
+            return [list(vals[f[0]:f[-1] + 1]) for f in self.frontiers()]
+        return [list(map(vals.__getitem__, f)) for f in self.frontiers()]
+
+    def bfs(self) -> List[Any]:
+        if self.bfs_numbered:
+            return list(self.vals)
+        return [v for level in self.levels() for v in level]
+
+    def height(self) -> int:
+        """Edges on the longest root-to-leaf path (-1 when empty)."""
+        return sum(1 for _ in self.frontiers()) - 1
+
+
+NaryTree = Union[NaryNode, CSRTree]
+
+
 # =============================================================
 # 4) Trie (Prefix Tree)
 # =============================================================
 
 class TrieNode:
-    __slots__ = ("children", "is_end")
+    __slots__ = ("children", "is_end", "weight", "top")
     def __init__(self):
         self.children: dict[str, TrieNode] = {}
         self.is_end: bool = False
+        self.weight: float = 0
+        # Best (-weight, word) entries of this subtree, sorted; only kept when Trie.top_k > 0
+        self.top: Optional[List[Tuple[float, str]]] = None
 
 class Trie:
-    def __init__(self):
+    def __init__(self, top_k: int = 0):
+        """top_k > 0 makes every node cache its top_k heaviest completions,
+        so complete(prefix, k <= top_k) costs O(len(prefix) + k)."""
         self.root = TrieNode()
+        self.top_k = top_k
 
-    def insert(self, word: str) -> None:
+    def insert(self, word: str, weight: Optional[float] = None) -> None:
+        """Insert word; weight (default 0 for new words) ranks it in complete().
+        Re-inserting an existing word with a weight updates that weight."""
         node = self.root
+        path = [node]
         for ch in word:
             node = node.children.setdefault(ch, TrieNode())
+            path.append(node)
+        old = node.weight if node.is_end else None
+        if weight is not None:
+            node.weight = weight
+        elif old is None:
+            node.weight = 0
         node.is_end = True
+        if self.top_k and node.weight != old:
+            self._rerank(path, word, old, node.weight)
+
+    def _rerank(self, path: List[TrieNode], word: str, old: Optional[float], new: Optional[float]) -> None:
+        """Fix the cached top lists on path (root..word) after word's weight
+        went from old to new (None = absent). Works bottom-up and stops as soon
+        as word cannot make the list: then it can't make any ancestor's list either."""
+        k = self.top_k
+        entry = None if new is None else (-new, word)
+        rising = new is not None and (old is None or new > old)
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            top = node.top if node.top is not None else []
+            node.top = top
+            i = next((j for j, (_, w) in enumerate(top) if w == word), -1)
+            if rising:
+                if i < 0 and len(top) >= k and entry > top[-1]:
+                    break
+                if i >= 0:
+                    del top[i]
+                bisect.insort(top, entry)
+                del top[k:]
+            else:
+                if i < 0:
+                    break
+                was_full = len(top) >= k
+                del top[i]
+                if was_full:
+                    # Something below the cut may now belong in the list.
+                    candidates = [e for child in node.children.values() for e in (child.top or ())]
+                    if node.is_end:
+                        candidates.append((-node.weight, word[:depth]))
+                    node.top = heapq.nsmallest(k, candidates)
+                elif entry is not None:
+                    bisect.insort(top, entry)
+
+    def _path(self, word: str) -> Optional[List[TrieNode]]:
+        node = self.root
+        path = [node]
+        for ch in word:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+            path.append(node)
+        return path
+
+    def complete(self, prefix: str, k: int = 10) -> List[str]:
+        """The k heaviest words starting with prefix (ties broken alphabetically)."""
+        path = self._path(prefix)
+        if path is None:
+            return []
+        node = path[-1]
+        if k <= self.top_k:
+            return [w for _, w in (node.top or ())[:k]]
+        # No (or too small) cache: rank the whole subtree. Each children dict
+        # is copied in one C-level step before walking it, so a concurrent
+        # writer (ShardedTrie reads take no lock) can't change it mid-loop.
+        entries: List[Tuple[float, str]] = []
+        stack = [(node, prefix)]
+        while stack:
+            cur, s = stack.pop()
+            if cur.is_end:
+                entries.append((-cur.weight, s))
+            for ch, child in list(cur.children.items()):
+                stack.append((child, s + ch))
+        return [w for _, w in heapq.nsmallest(k, entries)]
 
     def search(self, word: str) -> bool:
         node = self.root
         for ch in word:
-            if ch not in node.children:
+            # One get(), not `in` + [], so a concurrent prune can't slip between them.
+            node = node.children.get(ch)
+            if node is None:
                 return False
-            node = node.children[ch]
         return node.is_end
 
     def starts_with(self, prefix: str) -> bool:
         node = self.root
         for ch in prefix:
-            if ch not in node.children:
+            node = node.children.get(ch)
+            if node is None:
                 return False
-            node = node.children[ch]
         return True
 
     def delete(self, word: str) -> bool:
         """Delete a word if it exists. Returns True if removed."""
+        path = self._path(word) if self.top_k else None
         def _del(node: TrieNode, i: int) -> bool:
             if i == len(word):
                 if not node.is_end:
@@ -474,34 +2248,631 @@ class Trie:
                 del node.children[ch]
                 return not node.is_end and len(node.children) == 0
             return False
+        was_word = path is not None and path[-1].is_end
         removed = _del(self.root, 0)
+        if was_word:
+            self._rerank(path, word, path[-1].weight, None)
         return removed
 
 
+def _trie_items(trie: Trie) -> Generator[Tuple[str, float], None, None]:
+    """Every (word, weight) stored in a Trie, depth-first."""
+    stack = [(trie.root, "")]
+    while stack:
+        node, word = stack.pop()
+        if node.is_end:
+            yield word, node.weight
+        for ch, child in node.children.items():
+            stack.append((child, word + ch))
+
+
+class ShardedTrie:
+    """A Trie split into independently locked shards, for concurrent writers.
+
+    A word lives in the shard picked by hashing its first `prefix_len`
+    characters (the whole word when prefix_len is None), so writers on
+    different shards never wait for each other: insert / insert_many /
+    delete / merge only hold their shard's lock.
+
+    Reads (search, starts_with, complete) take no lock. They never iterate a
+    live children dict (complete copies each one before walking it) and look
+    children up with a single get(), so a concurrent insert or pruning delete
+    can't make them raise. Each one sees a concurrent update to the same word
+    either before or after it happens;
+    a complete() racing a reweight can briefly miss that word. Prefixes at
+    least prefix_len long are answered by a single shard, shorter ones fan
+    out over all shards.
+    """
+
+    def __init__(self, shards: int = 16, top_k: int = 0, prefix_len: Optional[int] = 1):
+        self.shards = [Trie(top_k) for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.top_k = top_k
+        self.prefix_len = prefix_len
+
+    def _shard(self, word: str) -> int:
+        return hash(word[:self.prefix_len]) % len(self.shards)
+
+    def _shards_for(self, prefix: str) -> List[Trie]:
+        if self.prefix_len is not None and len(prefix) >= self.prefix_len:
+            return [self.shards[self._shard(prefix)]]
+        return self.shards
+
+    def insert(self, word: str, weight: Optional[float] = None) -> None:
+        i = self._shard(word)
+        with self.locks[i]:
+            self.shards[i].insert(word, weight)
+
+    def insert_many(self, words: Iterable[str]) -> None:
+        """Insert a batch, taking each shard's lock once rather than once per word."""
+        buckets: dict[int, List[str]] = {}
+        for word in words:
+            buckets.setdefault(self._shard(word), []).append(word)
+        for i, bucket in buckets.items():
+            insert = self.shards[i].insert
+            with self.locks[i]:
+                for word in bucket:
+                    insert(word)
+
+    def delete(self, word: str) -> bool:
+        i = self._shard(word)
+        with self.locks[i]:
+            return self.shards[i].delete(word)
+
+    def search(self, word: str) -> bool:
+        return self.shards[self._shard(word)].search(word)
+
+    def starts_with(self, prefix: str) -> bool:
+        return any(shard.starts_with(prefix) for shard in self._shards_for(prefix))
+
+    def complete(self, prefix: str, k: int = 10) -> List[str]:
+        shards = self._shards_for(prefix)
+        if len(shards) == 1:
+            return shards[0].complete(prefix, k)
+        entries = []
+        for shard in shards:
+            for word in shard.complete(prefix, k):
+                path = shard._path(word)
+                if path is not None:  # may have been deleted since
+                    entries.append((-path[-1].weight, word))
+        return [w for _, w in heapq.nsmallest(k, entries)]
+
+    def merge(self, tries: Iterable[Trie]) -> None:
+        """Fold independently built Tries (e.g. one per ingestion thread) into
+        this one, as if each of their words were insert()ed with its weight.
+
+        Without top-k caches this is a structural merge: any source subtree
+        the destination lacks is grafted in whole, so the source Tries are
+        consumed and must not be used afterwards.
+        """
+        for src in tries:
+            if self.top_k or src.top_k or self.prefix_len != 1:
+                # Caches (or a sharding key longer than one child edge) need
+                # word-by-word inserts.
+                for word, weight in _trie_items(src):
+                    self.insert(word, weight)
+                continue
+            if src.root.is_end:
+                self.insert("", src.root.weight)
+            for ch, child in src.root.children.items():
+                i = self._shard(ch)
+                with self.locks[i]:
+                    _graft(self.shards[i].root, ch, child)
+
+
+def _graft(parent: TrieNode, ch: str, src: TrieNode) -> None:
+    """Merge the Trie subtree `src` into parent.children[ch], reusing src's nodes."""
+    stack = [(parent, ch, src)]
+    while stack:
+        parent, ch, src = stack.pop()
+        dst = parent.children.get(ch)
+        if dst is None:
+            parent.children[ch] = src
+            continue
+        if src.is_end:
+            dst.weight = src.weight
+            dst.is_end = True
+        stack.extend((dst, c, child) for c, child in src.children.items())
+
+
+# --- Compressed (radix) trie ---------------------------------------------------
+
+def _common_prefix_len(label: str, word: str, i: int) -> int:
+    """Length of the common prefix of label and word[i:].
+    Binary search over str.startswith keeps the per-character work in C."""
+    lo, hi = 0, min(len(label), len(word) - i)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if word.startswith(label[:mid], i):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class RadixNode:
+    """A radix-trie node. `label` is the edge label leading into this node.
+    Children are kept sorted by the first character of their label, and those
+    characters are mirrored in the string `firsts` for binary search."""
+    __slots__ = ("label", "firsts", "children", "is_end")
+
+    def __init__(self, label: str = "", is_end: bool = False):
+        self.label = label
+        self.firsts = ""
+        self.children: List[RadixNode] = []
+        self.is_end = is_end
+
+    def child(self, ch: str) -> Optional['RadixNode']:
+        i = bisect.bisect_left(self.firsts, ch)
+        if i < len(self.firsts) and self.firsts[i] == ch:
+            return self.children[i]
+        return None
+
+    def add_child(self, node: 'RadixNode') -> None:
+        ch = node.label[0]
+        i = bisect.bisect_left(self.firsts, ch)
+        self.firsts = self.firsts[:i] + ch + self.firsts[i:]
+        self.children.insert(i, node)
+
+    def replace_child(self, new: 'RadixNode') -> None:
+        """Swap out the child whose label starts with the same character as new's."""
+        self.children[bisect.bisect_left(self.firsts, new.label[0])] = new
+
+    def remove_child(self, ch: str) -> None:
+        i = bisect.bisect_left(self.firsts, ch)
+        self.firsts = self.firsts[:i] + self.firsts[i + 1:]
+        del self.children[i]
+
+    def absorb_only_child(self) -> None:
+        """Merge this node with its single child (used when it stops being a word end)."""
+        child = self.children[0]
+        self.label += child.label
+        self.firsts, self.children, self.is_end = child.firsts, child.children, child.is_end
+
+
+class RadixTrie:
+    """Trie with one node per branching point instead of one per character.
+
+    Same insert/search/starts_with/delete semantics as Trie; long shared
+    prefixes (URLs, paths) cost one node and one label string instead of one
+    node + dict per character.
+    """
+
+    def __init__(self):
+        self.root = RadixNode()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def from_sorted(cls, words: Iterable[str]) -> 'RadixTrie':
+        """Build from ascending words in O(total length), without any splits
+        of already-placed children. Duplicates are dropped."""
+        trie = cls()
+        # Path of the previous word: (node, string depth at the end of its label)
+        stack: List[Tuple[RadixNode, int]] = [(trie.root, 0)]
+        prev: Optional[str] = None
+        for w in words:
+            k = 0
+            if prev is not None:
+                if w <= prev:
+                    if w == prev:
+                        continue
+                    raise ValueError("from_sorted needs ascending input")
+                k = _common_prefix_len(prev, w, 0)
+            popped: Optional[RadixNode] = None
+            while stack[-1][1] > k:
+                popped = stack.pop()[0]
+            top, depth = stack[-1]
+            if depth < k:
+                # w leaves prev's path inside popped's edge: split that edge.
+                # popped is top's last child because input is sorted.
+                cut = k - depth
+                mid = RadixNode(popped.label[:cut])
+                popped.label = popped.label[cut:]
+                mid.firsts, mid.children = popped.label[0], [popped]
+                top.children[-1] = mid
+                top = mid
+                stack.append((mid, k))
+            if len(w) == k:
+                top.is_end = True  # only the empty word can end on the path of prev
+            else:
+                leaf = RadixNode(w[k:], True)
+                top.children.append(leaf)
+                top.firsts += leaf.label[0]
+                stack.append((leaf, len(w)))
+            trie.count += 1
+            prev = w
+        return trie
+
+    def insert(self, word: str) -> None:
+        node = self.root
+        i = 0
+        while i < len(word):
+            child = node.child(word[i])
+            if child is None:
+                node.add_child(RadixNode(word[i:], True))
+                self.count += 1
+                return
+            label = child.label
+            if word.startswith(label, i):
+                node = child
+                i += len(label)
+                continue
+            j = _common_prefix_len(label, word, i)
+            # Split child's edge at j
+            mid = RadixNode(label[:j])
+            child.label = label[j:]
+            mid.firsts, mid.children = child.label[0], [child]
+            node.replace_child(mid)
+            i += j
+            if i == len(word):
+                mid.is_end = True
+            else:
+                mid.add_child(RadixNode(word[i:], True))
+            self.count += 1
+            return
+        if not node.is_end:
+            node.is_end = True
+            self.count += 1
+
+    def _find(self, word: str, prefix: bool = False) -> Optional[RadixNode]:
+        """Node where word ends; with prefix=True also the node whose edge word ends inside."""
+        node = self.root
+        i = 0
+        while i < len(word):
+            child = node.child(word[i])
+            if child is None:
+                return None
+            label = child.label
+            if word.startswith(label, i):
+                node = child
+                i += len(label)
+            elif prefix and label.startswith(word[i:]):
+                return child
+            else:
+                return None
+        return node
+
+    def search(self, word: str) -> bool:
+        node = self._find(word)
+        return node is not None and node.is_end
+
+    def starts_with(self, prefix: str) -> bool:
+        return self._find(prefix, prefix=True) is not None
+
+    def delete(self, word: str) -> bool:
+        """Delete a word if it exists. Returns True if removed."""
+        parent: Optional[RadixNode] = None
+        node = self.root
+        i = 0
+        while i < len(word):
+            child = node.child(word[i])
+            if child is None or not word.startswith(child.label, i):
+                return False
+            parent, node = node, child
+            i += len(child.label)
+        if not node.is_end:
+            return False
+        node.is_end = False
+        self.count -= 1
+        if parent is None:
+            return True  # the empty word lives on the root, which is never pruned
+        if not node.children:
+            parent.remove_child(node.label[0])
+            if parent is not self.root and not parent.is_end and len(parent.children) == 1:
+                parent.absorb_only_child()
+        elif len(node.children) == 1:
+            node.absorb_only_child()
+        return True
+
+    def __iter__(self) -> Generator[str, None, None]:
+        """Yield all words in sorted order."""
+        stack: List[Tuple[RadixNode, str]] = [(self.root, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if node.is_end:
+                yield prefix
+            for child in reversed(node.children):
+                stack.append((child, prefix + child.label))
+
+    def freeze(self) -> 'FrozenRadixTrie':
+        return FrozenRadixTrie(self)
+
+
+class FrozenRadixTrie:
+    """Read-only RadixTrie packed into flat buffers for serving.
+
+    Nodes are numbered in BFS order, so node i's children are the contiguous
+    range first_child[i] .. first_child[i] + n_children[i] - 1. Every edge
+    label is the slice text[label_start[i]:label_end[i]] of one shared
+    string, and firsts[i] is its first character (binary-searched per node).
+    """
+    __slots__ = ("text", "label_start", "label_end", "first_child", "n_children",
+                 "firsts", "is_end", "count")
+
+    def __init__(self, trie: RadixTrie):
+        self.label_start = array("q")
+        self.label_end = array("q")
+        self.first_child = array("q")
+        self.n_children = array("l")
+        self.is_end = bytearray()
+        self.count = trie.count
+        parts: List[str] = []
+        firsts: List[str] = []
+        offset = 0
+        order: Deque[RadixNode] = deque([trie.root])
+        next_index = 1
+        while order:
+            node = order.popleft()
+            self.label_start.append(offset)
+            offset += len(node.label)
+            self.label_end.append(offset)
+            parts.append(node.label)
+            firsts.append(node.label[:1] or "\0")
+            self.is_end.append(node.is_end)
+            self.first_child.append(next_index)
+            self.n_children.append(len(node.children))
+            next_index += len(node.children)
+            order.extend(node.children)
+        self.text = "".join(parts)
+        self.firsts = "".join(firsts)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, word: str, prefix: bool = False) -> int:
+        text, firsts = self.text, self.firsts
+        node = 0
+        i = 0
+        while i < len(word):
+            lo = self.first_child[node]
+            hi = lo + self.n_children[node]
+            c = bisect.bisect_left(firsts, word[i], lo, hi)
+            if c == hi or firsts[c] != word[i]:
+                return NIL
+            label = text[self.label_start[c]:self.label_end[c]]
+            if word.startswith(label, i):
+                node = c
+                i += len(label)
+            elif prefix and label.startswith(word[i:]):
+                return c
+            else:
+                return NIL
+        return node
+
+    def search(self, word: str) -> bool:
+        node = self._find(word)
+        return node != NIL and bool(self.is_end[node])
+
+    def starts_with(self, prefix: str) -> bool:
+        return self._find(prefix, prefix=True) != NIL
+
+
 # =============================================================
 # 5) Heap (Binary Min-Heap via heapq)
 # =============================================================
 
 def demo_heap(nums: Iterable[int]) -> List[int]:
     """Return numbers sorted using a heap (priority queue)."""
-    h: List[int] = []
-    for x in nums:
-        heapq.heappush(h, x)
+    h = list(nums)
+    heapq.heapify(h)  # O(n) bulk build instead of n pushes
     out: List[int] = []
     while h:
         out.append(heapq.heappop(h))
     return out
 
 
+# heapq only made its max-heap functions public in Python 3.14; older versions
+# ship the C implementations of all but push/pushpop under private names.
+def _heappush_max_fallback(heap: List[Any], item: Any) -> None:
+    heap.append(item)
+    heapq._siftdown_max(heap, 0, len(heap) - 1)
+
+
+def _heappushpop_max_fallback(heap: List[Any], item: Any) -> Any:
+    if heap and item < heap[0]:
+        return heapq._heapreplace_max(heap, item)
+    return item
+
+
+_heapify_max = getattr(heapq, "heapify_max", None) or heapq._heapify_max
+_heappop_max = getattr(heapq, "heappop_max", None) or heapq._heappop_max
+_heapreplace_max = getattr(heapq, "heapreplace_max", None) or heapq._heapreplace_max
+_heappush_max = getattr(heapq, "heappush_max", None) or _heappush_max_fallback
+_heappushpop_max = getattr(heapq, "heappushpop_max", None) or _heappushpop_max_fallback
+
+_TOMBSTONE = object()  # stands in for the item of a superseded IndexedHeap entry
+
+
+class MinHeap:
+    """Binary min-heap over a plain list (`data`), bulk-built in O(n)."""
+    __slots__ = ("data",)
+
+    _heapify = staticmethod(heapq.heapify)
+    _push = staticmethod(heapq.heappush)
+    _pop = staticmethod(heapq.heappop)
+    _replace = staticmethod(heapq.heapreplace)
+    _pushpop = staticmethod(heapq.heappushpop)
+
+    def __init__(self, items: Iterable[Any] = ()):
+        self.data = list(items)
+        self._heapify(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(size={len(self.data)})"
+
+    def peek(self) -> Any:
+        if not self.data:
+            raise IndexError("peek from an empty heap")
+        return self.data[0]
+
+    def push(self, item: Any) -> None:
+        self._push(self.data, item)
+
+    def pop(self) -> Any:
+        if not self.data:
+            raise IndexError("pop from an empty heap")
+        return self._pop(self.data)
+
+    def replace(self, item: Any) -> Any:
+        """Pop the top and push item with a single sift."""
+        if not self.data:
+            raise IndexError("replace on an empty heap")
+        return self._replace(self.data, item)
+
+    def pushpop(self, item: Any) -> Any:
+        """Push item and pop the top with a single sift."""
+        return self._pushpop(self.data, item)
+
+    def drain(self) -> Generator[Any, None, None]:
+        """Pop everything, lazily, in heap order."""
+        data, pop = self.data, self._pop
+        while data:
+            yield pop(data)
+
+
+class MaxHeap(MinHeap):
+    """Binary max-heap that compares items directly: no negation, so it works
+    for strings, tuples and any other orderable type."""
+    __slots__ = ()
+
+    _heapify = staticmethod(_heapify_max)
+    _push = staticmethod(_heappush_max)
+    _pop = staticmethod(_heappop_max)
+    _replace = staticmethod(_heapreplace_max)
+    _pushpop = staticmethod(_heappushpop_max)
+
+
+class IndexedHeap:
+    """Min-priority queue whose entries can be re-prioritised or removed.
+
+    push(item, priority) returns an int handle; decrease_key / update /
+    remove / priority take that handle. Entries are [priority, handle, seq,
+    item] lists kept in a heapq heap, so every sift runs in C. A
+    re-prioritised entry is pushed again and its old copy is tombstoned
+    rather than moved; pops skip tombstones, and the heap is compacted once
+    they outnumber live entries. decrease_key/update are O(log n), remove
+    O(1), pop O(log n) amortized. Equal priorities pop in push order; items
+    are never compared.
+    """
+    __slots__ = ("_heap", "_entries", "_next", "_seq")
+
+    def __init__(self, pairs: Iterable[Tuple[Any, Any]] = ()):
+        """Bulk-build from (item, priority) pairs in O(n); handles are 0..n-1."""
+        self._heap: List[list] = [[priority, handle, 0, item] for handle, (item, priority) in enumerate(pairs)]
+        self._entries: dict[int, list] = {entry[1]: entry for entry in self._heap}
+        self._next = len(self._heap)
+        self._seq = 1  # tells a handle's re-pushed entry from its tombstones
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, handle: int) -> bool:
+        return handle in self._entries
+
+    def __repr__(self) -> str:
+        return f"IndexedHeap(size={len(self._entries)})"
+
+    def push(self, item: Any, priority: Any) -> int:
+        handle = self._next
+        self._next += 1
+        entry = [priority, handle, 0, item]
+        self._entries[handle] = entry
+        heapq.heappush(self._heap, entry)
+        return handle
+
+    def _live_top(self) -> list:
+        heap = self._heap
+        while heap and heap[0][3] is _TOMBSTONE:
+            heapq.heappop(heap)
+        if not heap:
+            raise IndexError("pop from an empty heap")
+        return heap[0]
+
+    def peek(self) -> Tuple[Any, Any]:
+        entry = self._live_top()
+        return entry[3], entry[0]
+
+    def pop(self) -> Tuple[Any, Any]:
+        """Remove and return the (item, priority) with the smallest priority."""
+        self._live_top()
+        priority, handle, _, item = heapq.heappop(self._heap)
+        del self._entries[handle]
+        return item, priority
+
+    def priority(self, handle: int) -> Any:
+        return self._entries[handle][0]
+
+    def item(self, handle: int) -> Any:
+        return self._entries[handle][3]
+
+    def _tombstone(self, entry: list) -> None:
+        entry[3] = _TOMBSTONE
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [e for e in self._heap if e[3] is not _TOMBSTONE]
+            heapq.heapify(self._heap)
+
+    def update(self, handle: int, priority: Any) -> None:
+        """Set a new priority, higher or lower."""
+        old = self._entries[handle]
+        if old[0] == priority:
+            return
+        entry = [priority, handle, self._seq, old[3]]
+        self._seq += 1
+        self._entries[handle] = entry
+        heapq.heappush(self._heap, entry)
+        self._tombstone(old)
+
+    def decrease_key(self, handle: int, priority: Any) -> None:
+        current = self._entries[handle][0]
+        if current < priority:
+            raise ValueError(f"new priority {priority!r} is greater than current {current!r}")
+        self.update(handle, priority)
+
+    def remove(self, handle: int) -> Tuple[Any, Any]:
+        """Remove an entry by handle and return its (item, priority)."""
+        entry = self._entries.pop(handle)
+        priority, item = entry[0], entry[3]
+        self._tombstone(entry)
+        return item, priority
+
+
+def kway_merge(iterables: Iterable[Iterable[Any]], key: Optional[Callable[[Any], Any]] = None,
+               reverse: bool = False) -> Iterable[Any]:
+    """Lazily merge already-sorted inputs into one sorted stream.
+
+    Holds one pending item per input, so memory is O(k) however long the
+    inputs are; `iterables` may itself be a generator (e.g. open files).
+    """
+    return heapq.merge(*iterables, key=key, reverse=reverse)
+
+
 # =============================================================
 # 6) Segment Tree (Range Sum, Point Update)
 # =============================================================
 
+def _build_internal(tree: List[Any], size: int, op: Callable[[Any, Any], Any]) -> None:
+    """Fill tree[1:size] bottom-up, one level at a time. Each level is a
+    single map() over two strided slices, so the loop runs in C."""
+    lo = size // 2
+    while lo >= 1:
+        tree[lo:2 * lo] = map(op, tree[2 * lo:4 * lo:2], tree[2 * lo + 1:4 * lo:2])
+        lo //= 2
+
+
 class SegmentTree:
     """A classic array-based segment tree for range sums.
     - build: O(n)
     - point update: O(log n)
     - range sum query: O(log n)
+    - range_sum_many: O(1) per query from a cached prefix-sum array while
+      there are no interleaved updates (offline mode)
     """
 
     def __init__(self, arr: List[int]):
@@ -514,10 +2885,11 @@ class SegmentTree:
         # Build leaves
         self.tree[size:size + self.n] = arr[:]
         # Build internal nodes
-        for i in range(size - 1, 0, -1):
-            self.tree[i] = self.tree[2 * i] + self.tree[2 * i + 1]
+        _build_internal(self.tree, size, operator.add)
+        self._prefix: Optional[List[int]] = None  # prefix sums of the leaves; None = stale
 
     def update(self, idx: int, value: int) -> None:
+        self._prefix = None
         i = self.size + idx
         self.tree[i] = value
         i //= 2
@@ -541,6 +2913,188 @@ class SegmentTree:
             r //= 2
         return s
 
+    def range_sum_many(self, ls: Iterable[int], rs: Iterable[int]) -> List[int]:
+        """Sums on [ls[i], rs[i]] inclusive for a whole batch of queries.
+
+        Answers come from prefix sums of the leaves (two lookups per query,
+        looped in C via map). The prefix array is cached until the next
+        update; rebuilding it costs O(n), so a batch too small to pay for
+        that falls back to range_sum per query.
+        """
+        ls, rs = list(ls), list(rs)
+        if len(ls) != len(rs):
+            raise ValueError("ls and rs must have the same length")
+        if self._prefix is None:
+            # ~4 tree steps per level per query vs ~1 step per element to rebuild
+            if 4 * len(ls) * self.size.bit_length() < self.n:
+                return list(map(self.range_sum, ls, rs))
+            self._prefix = list(itertools.accumulate(self.tree[self.size:self.size + self.n], initial=0))
+        p = self._prefix
+        return list(map(operator.sub, map(p.__getitem__, map((1).__add__, rs)), map(p.__getitem__, ls)))
+
+
+@dataclass(frozen=True)
+class Monoid:
+    """An associative `combine` with its `identity`, plus how lazy range
+    updates act on an aggregate of `length` elements:
+    - add(aggregate, delta, length): effect of adding delta to every element
+      (None = range_add unsupported, e.g. gcd)
+    - repeat(value, length): aggregate of `length` copies of value
+      (None = derived from combine by repeated doubling)
+    """
+    combine: Callable[[Any, Any], Any]
+    identity: Any
+    add: Optional[Callable[[Any, Any, int], Any]] = None
+    repeat: Optional[Callable[[Any, int], Any]] = None
+
+
+SUM_MONOID = Monoid(operator.add, 0, add=lambda agg, d, n: agg + d * n, repeat=lambda v, n: v * n)
+MIN_MONOID = Monoid(min, math.inf, add=lambda agg, d, n: agg + d, repeat=lambda v, n: v)
+MAX_MONOID = Monoid(max, -math.inf, add=lambda agg, d, n: agg + d, repeat=lambda v, n: v)
+GCD_MONOID = Monoid(math.gcd, 0, repeat=lambda v, n: abs(v))
+
+_UNSET = object()  # "no pending assignment" in LazySegmentTree tags
+
+
+class LazySegmentTree:
+    """Segment tree over any Monoid with lazy range add / range assign.
+    - build: O(n)
+    - point update, range add, range assign: O(log n)
+    - range query: O(log n)
+    Ranges are inclusive [l, r] like SegmentTree. The combine function need
+    not be commutative; query folds elements left to right.
+
+    Each internal node carries a pending tag "assign `set` (if any), then add
+    `add`" that is pushed to its children before they are looked at.
+    """
+
+    def __init__(self, arr: List[Any], monoid: Monoid = SUM_MONOID):
+        self.n = len(arr)
+        self.monoid = monoid
+        self.log = max(1, (self.n - 1).bit_length())
+        size = 1 << self.log
+        self.size = size
+        e, op = monoid.identity, monoid.combine
+        self.tree = [e] * (2 * size)
+        self.tree[size:size + self.n] = arr[:]
+        _build_internal(self.tree, size, op)
+        self.tag_set: List[Any] = [_UNSET] * size
+        self.tag_add: List[Any] = [0] * size
+        # Bound once: these run on every tag push.
+        self._repeat = monoid.repeat or self._repeat_by_doubling
+        self._add = monoid.add
+
+    def _repeat_by_doubling(self, value: Any, length: int) -> Any:
+        op = self.monoid.combine
+        acc, base = self.monoid.identity, value
+        while length:
+            if length & 1:
+                acc = op(acc, base)
+            base = op(base, base)
+            length >>= 1
+        return acc
+
+    def _apply(self, k: int, set_val: Any, delta: Any) -> None:
+        """Apply the tag (assign set_val, then add delta) to node k."""
+        length = self.size >> (k.bit_length() - 1)
+        tree = self.tree
+        if set_val is not _UNSET:
+            tree[k] = self._repeat(set_val, length)
+        if delta:
+            tree[k] = self._add(tree[k], delta, length)
+        if k < self.size:
+            if set_val is not _UNSET:
+                self.tag_set[k] = set_val
+                self.tag_add[k] = delta
+            else:
+                self.tag_add[k] += delta
+
+    def _push(self, k: int) -> None:
+        s, d = self.tag_set[k], self.tag_add[k]
+        if s is not _UNSET or d:
+            apply = self._apply
+            apply(2 * k, s, d)
+            apply(2 * k + 1, s, d)
+            self.tag_set[k] = _UNSET
+            self.tag_add[k] = 0
+
+    def _pull(self, k: int) -> None:
+        self.tree[k] = self.monoid.combine(self.tree[2 * k], self.tree[2 * k + 1])
+
+    def _push_bounds(self, l: int, r: int) -> None:
+        """Push tags on the paths to leaves l and r (exclusive) from the root down."""
+        push = self._push
+        for i in range(self.log, 0, -1):
+            if ((l >> i) << i) != l:
+                push(l >> i)
+            if ((r >> i) << i) != r:
+                push((r - 1) >> i)
+
+    def update(self, idx: int, value: Any) -> None:
+        """Point assignment arr[idx] = value."""
+        p = idx + self.size
+        for i in range(self.log, 0, -1):
+            self._push(p >> i)
+        self.tree[p] = value
+        for i in range(1, self.log + 1):
+            self._pull(p >> i)
+
+    def query(self, l: int, r: int) -> Any:
+        """Aggregate of arr[l..r] inclusive."""
+        if l > r:
+            return self.monoid.identity
+        op = self.monoid.combine
+        l += self.size
+        r += self.size + 1
+        self._push_bounds(l, r)
+        left = right = self.monoid.identity
+        while l < r:
+            if l & 1:
+                left = op(left, self.tree[l])
+                l += 1
+            if r & 1:
+                r -= 1
+                right = op(self.tree[r], right)
+            l >>= 1
+            r >>= 1
+        return op(left, right)
+
+    def range_sum(self, l: int, r: int) -> Any:
+        """SegmentTree-compatible alias of query()."""
+        return self.query(l, r)
+
+    def _range_apply(self, l: int, r: int, set_val: Any, delta: Any) -> None:
+        if l > r:
+            return
+        l += self.size
+        r += self.size + 1
+        self._push_bounds(l, r)
+        l0, r0 = l, r
+        while l < r:
+            if l & 1:
+                self._apply(l, set_val, delta)
+                l += 1
+            if r & 1:
+                r -= 1
+                self._apply(r, set_val, delta)
+            l >>= 1
+            r >>= 1
+        for i in range(1, self.log + 1):
+            if ((l0 >> i) << i) != l0:
+                self._pull(l0 >> i)
+            if ((r0 >> i) << i) != r0:
+                self._pull((r0 - 1) >> i)
+
+    def range_add(self, l: int, r: int, delta: Any) -> None:
+        """arr[i] += delta for l <= i <= r."""
+        if self.monoid.add is None:
+            raise TypeError("this monoid has no range-add rule (Monoid.add is None)")
+        self._range_apply(l, r, _UNSET, delta)
+
+    def range_assign(self, l: int, r: int, value: Any) -> None:
+        """arr[i] = value for l <= i <= r."""
+        self._range_apply(l, r, value, 0)
+
 
 # =============================================================
 # Usage Examples
@@ -549,7 +3103,17 @@ if __name__ == "__main__":
     print("\n--- Binary Tree build/serialize/pretty ---")
     root = build_tree_from_level_list([1, 2, 3, None, 4, 5, 6])
     pretty_print(root)
+    print("depth-limited (max_depth=1):")
+    pretty_print(root, max_depth=1)
     print("level list:", serialize_level(root))
+    compact = ArrayTree.from_treenode(root)
+    print("compact:", compact, "inorder:", inorder_iterative(compact))
+    bin_path = os.path.join(tempfile.gettempdir(), "trees_demo.bt")
+    write_tree_binary(bin_path, root)
+    with MappedTree(bin_path) as mapped:
+        print("mmap'ed right subtree, preorder:", preorder_iterative(mapped.root.right))
+    print("read back:", serialize_level(read_tree_binary(bin_path)))
+    os.remove(bin_path)
 
     print("\n--- Traversals ---")
     print("preorder(rec):  ", preorder_recursive(root))
@@ -560,6 +3124,9 @@ if __name__ == "__main__":
     print("postorder(iter):", postorder_iterative(root))
     print("level order:    ", level_order(root))
     print("zigzag level:   ", zigzag_level_order(root))
+    print("inorder(lazy), first 3:", list(itertools.islice(inorder_lazy(root), 3)))
+    print("morris inorder: ", list(morris_inorder(root)))
+    print("morris preorder:", list(morris_preorder(root)))
 
     print("\n--- Properties ---")
     print("size:", size(root))
@@ -583,21 +3150,46 @@ if __name__ == "__main__":
     n4 = find(root, 4)
     n5 = find(root, 5)
     print("LCA(4,5):", lca_binary_tree(root, n4, n5).val if n4 and n5 else None)
+    lca_index = LCAIndex(root)
+    print("LCAIndex batch [(4,5), (5,6)]:",
+          [n.val for n in lca_index.query_many([(n4, n5), (n5, find(root, 6))])])
+
+    forest = [build_tree_from_level_list(vals, compact=True) for vals in ([1, 2, 3], [4, None, 5, 6], [])]
+    print("forest_stats:", forest_stats(forest, target_sum=4, workers=1))
 
     print("\n--- BST ---")
     bst = BST.from_iterable([7, 3, 9, 1, 5, 8, 10])
     pretty_print(bst.root)
     print("search 5:", bst.search(5))
     print("kth_smallest(3):", bst.kth_smallest(3))
+    print("rank(8):", bst.rank(8), " count_in_range(3, 8):", bst.count_in_range(3, 8))
+    print("select_many([1, 7, 4]):", bst.select_many([1, 7, 4]))
     print("valid BST?:", bst.validate_bst())
     bst.delete(7)
     print("after delete 7:")
     pretty_print(bst.root)
+    print("len / height / balanced (O(1)):", len(bst), bst.height(), bst.is_balanced())
+
+    avl = BST.from_iterable(range(1, 8), balanced=True)
+    print("AVL from sorted inserts, height:", height(avl.root))
+    print("range(3, 5):", list(avl.range(3, 5)), " delete_range(3, 5):", avl.delete_range(3, 5),
+          " left:", inorder_iterative(avl.root))
+    upper = avl.split(6)
+    print("split(6):", inorder_iterative(avl.root), inorder_iterative(upper.root))
+    avl.join(upper)
+    print("from_sorted(1..7) level list:", serialize_level(BST.from_sorted(range(1, 8)).root))
+    pbst = PersistentBST.from_sorted(range(1, 8))
+    v1 = pbst.snapshot()
+    pbst.delete(4)
+    pbst.insert(10)
+    print("PersistentBST snapshot:", inorder_iterative(v1.root), " current:", inorder_iterative(pbst.root))
 
     print("\n--- N-ary Tree ---")
     nroot = NaryNode(1, [NaryNode(2, []), NaryNode(3, [NaryNode(4, [])])])
     print("DFS:", nary_dfs(nroot))
     print("BFS:", nary_bfs(nroot))
+    csr = CSRTree.from_parents([-1, 0, 0, 2], vals=[1, 2, 3, 4])
+    print("CSRTree from parents [-1, 0, 0, 2]: DFS", nary_dfs(csr), " levels", csr.levels())
 
     print("\n--- Trie ---")
     tri = Trie()
@@ -607,9 +3199,33 @@ if __name__ == "__main__":
     print("starts_with 'ca':", tri.starts_with("ca"))
     tri.delete("car")
     print("search 'car' after delete:", tri.search("car"))
+    ac = Trie(top_k=3)
+    for w, weight in [("car", 5), ("cart", 9), ("cat", 7), ("care", 1), ("dog", 3)]:
+        ac.insert(w, weight)
+    print("complete('ca', 2):", ac.complete("ca", 2))
+    sharded = ShardedTrie(shards=4)
+    workers = [threading.Thread(target=sharded.insert_many, args=(batch,))
+               for batch in (["car", "cart"], ["cat", "dog"], ["door", "cab"])]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    part = Trie()
+    part.insert("dot")
+    sharded.merge([part])
+    print("ShardedTrie after 3 writer threads + merge: search 'dot':", sharded.search("dot"),
+          " complete('ca'):", sharded.complete("ca"))
+    rtri = RadixTrie.from_sorted(["car", "cart", "cat", "dog"])
+    print("radix words:", list(rtri), " frozen starts_with 'ca':", rtri.freeze().starts_with("ca"))
 
     print("\n--- Heap ---")
     print("heap sorted:", demo_heap([5, 1, 4, 2, 9, 0]))
+    print("MaxHeap of words:", list(MaxHeap(["pear", "apple", "fig"]).drain()))
+    pq = IndexedHeap([("a", 5), ("b", 3), ("c", 4)])
+    pq.decrease_key(0, 1)  # handle 0 is "a"
+    pq.remove(2)           # drop "c"
+    print("IndexedHeap after decrease_key(a -> 1), remove(c):", [pq.pop() for _ in range(len(pq))])
+    print("kway_merge:", list(kway_merge([[1, 4, 7], [2, 5], [0, 9]])))
 
     print("\n--- Segment Tree ---")
     arr = [1, 3, 5, 7, 9, 11]
@@ -617,4 +3233,9 @@ if __name__ == "__main__":
     print("sum[1,3] (3+5+7):", st.range_sum(1, 3))
     st.update(2, 6)  # arr[2]=6
     print("sum[1,3] after update (3+6+7):", st.range_sum(1, 3))
+    print("range_sum_many([0,1],[5,3]):", st.range_sum_many([0, 1], [5, 3]))
+    lst = LazySegmentTree(arr, MIN_MONOID)
+    lst.range_add(0, 2, 10)      # [11, 13, 15, 7, 9, 11]
+    lst.range_assign(4, 5, 2)    # [11, 13, 15, 7, 2, 2]
+    print("min[0,3] after range add:", lst.query(0, 3), " min[0,5] after assign:", lst.query(0, 5))
 # Definition for a binary tree node.
\ No newline at end of file
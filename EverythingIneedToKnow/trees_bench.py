@@ -0,0 +1,1277 @@
+"""
+Benchmarks for Trees.py
+-----------------------
+Run directly: `python trees_bench.py`. Each bench_* function prints its own
+numbers; pass a smaller n to any of them for a quick check.
+
+Regression suite: `python trees_bench.py --suite --json out.json` times and
+tracemalloc-profiles every structure on balanced/random/skewed inputs of
+10^3..10^6 elements and writes the results as JSON. Add `--baseline old.json`
+to flag cases that got slower or hungrier than a previous run.
+"""
+from __future__ import annotations
+import argparse
+import functools
+import gc
+import heapq
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from Trees import (
+    BST, ArrayTree, TreeNode, build_tree_from_level_list, height, inorder_iterative,
+    inorder_lazy, level_order, level_order_lazy, morris_inorder, morris_preorder,
+    postorder_iterative, postorder_lazy, preorder_iterative, preorder_lazy,
+    LCAIndex, LazySegmentTree, MappedTree, NaryNode, diameter, has_path_sum,
+    inorder_recursive, is_balanced, lca_binary_tree, nary_dfs, postorder_recursive,
+    preorder_recursive, root_to_leaf_paths, RadixTrie, SegmentTree, Trie, read_tree_binary,
+    serialize_level, size, write_tree_binary, forest_stats, demo_heap, zigzag_level_order,
+    CSRTree, NIL, nary_bfs, IndexedHeap, MaxHeap, MinHeap, kway_merge,
+    pretty_pages, pretty_print, PersistentBST, ShardedTrie,
+)
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[Any, float, int]:
+    """Run fn twice: once timed, once under tracemalloc.
+
+    Returns (result, seconds, peak traced bytes). Timing is taken without
+    tracing because tracemalloc slows every allocation down several times.
+    """
+    gc.collect()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def retained(fn: Callable[[], Any]) -> Tuple[Any, float, int]:
+    """Like measure(), but report bytes still allocated while the result is alive."""
+    gc.collect()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current
+
+
+def _row(label: str, secs: float, nbytes: Optional[int] = None) -> None:
+    mem = "" if nbytes is None else f" {nbytes / 2**20:9.1f} MiB"
+    print(f"  {label:<34} {secs * 1000:9.1f} ms{mem}")
+
+
+# =============================================================
+# 1) TreeNode vs ArrayTree
+# =============================================================
+
+def bench_array_tree(n: int = 10**6) -> None:
+    print(f"\n--- TreeNode vs ArrayTree, n={n:,} (complete tree, int values) ---")
+    values = list(range(n))
+    for label, build in [
+        ("TreeNode", lambda: build_tree_from_level_list(values)),
+        ("ArrayTree (list values)", lambda: ArrayTree.from_level_list(values)),
+        ("ArrayTree (typecode 'q')", lambda: ArrayTree.from_level_list(values, "q")),
+    ]:
+        tree, secs, mem = retained(build)
+        _row(f"build {label}", secs, mem)
+        for name, fn in [("size", size), ("height", height),
+                         ("preorder_iterative", preorder_iterative),
+                         ("inorder_iterative", inorder_iterative),
+                         ("level_order", level_order),
+                         ("serialize_level", serialize_level)]:
+            _, secs, peak = measure(lambda: fn(tree))
+            _row(f"  {name}", secs, peak)
+        del tree
+
+
+# =============================================================
+# 2) BST on sorted input: plain vs AVL vs from_sorted
+# =============================================================
+
+def bench_bst_sorted(sizes: Tuple[int, ...] = (1000, 2000, 4000), big: int = 10**5) -> None:
+    print("\n--- BST on sorted input (build + search every key) ---")
+
+    def run(label: str, make: Callable[[], BST], n: int) -> None:
+        bst, build_secs, _ = measure(make)
+        t0 = time.perf_counter()
+        for k in range(n):
+            bst.search(k)
+        search_secs = time.perf_counter() - t0
+        h = height(bst.root)
+        print(f"  {label:<26} n={n:<8,} build {build_secs * 1000:9.1f} ms   "
+              f"search {search_secs * 1000:9.1f} ms   height {h}")
+
+    for n in sizes:
+        run("plain from_iterable", lambda: BST.from_iterable(range(n)), n)
+    for n in sizes + (big,):
+        run("AVL from_iterable", lambda: BST.from_iterable(range(n), balanced=True), n)
+    for n in sizes + (big,):
+        run("from_sorted", lambda: BST.from_sorted(range(n)), n)
+
+# =============================================================
+# 3) Traversal modes: list vs lazy vs Morris
+# =============================================================
+
+def left_chain(n: int) -> TreeNode:
+    """A degenerate tree where every node is the left child of the previous one."""
+    root = cur = TreeNode(0)
+    for i in range(1, n):
+        cur.left = TreeNode(i)
+        cur = cur.left
+    return root
+
+
+def _drain(it: Any) -> None:
+    for _ in it:
+        pass
+
+
+def bench_traversal_modes(n: int = 10**6, first: int = 10) -> None:
+    trees = [("complete", build_tree_from_level_list(list(range(n)))),
+             ("left chain", left_chain(n))]
+    modes = [
+        ("preorder_iterative", preorder_iterative, False),
+        ("preorder_lazy", preorder_lazy, True),
+        ("morris_preorder", morris_preorder, True),
+        ("inorder_iterative", inorder_iterative, False),
+        ("inorder_lazy", inorder_lazy, True),
+        ("morris_inorder", morris_inorder, True),
+        ("postorder_iterative", postorder_iterative, False),
+        ("postorder_lazy", postorder_lazy, True),
+        ("level_order", level_order, False),
+        ("level_order_lazy", level_order_lazy, True),
+    ]
+    for shape, root in trees:
+        print(f"\n--- traversal modes, {shape} tree, n={n:,} (full walk / first {first}) ---")
+        for label, fn, lazy in modes:
+            _, secs, peak = measure(lambda: _drain(fn(root)))
+            if lazy:
+                _, fsecs, fpeak = measure(lambda: list(itertools.islice(fn(root), first)))
+            else:
+                fsecs, fpeak = secs, peak  # a list has to be built in full either way
+            print(f"  {label:<22} {secs * 1000:8.1f} ms {peak / 2**20:8.2f} MiB"
+                  f"   | {fsecs * 1000:8.3f} ms {fpeak / 2**20:8.2f} MiB")
+
+
+# =============================================================
+# 4) Trie vs RadixTrie vs FrozenRadixTrie
+# =============================================================
+
+def synthetic_urls(n: int, seed: int = 1) -> list:
+    """URL-like keys with long shared prefixes."""
+    rng = random.Random(seed)
+    hosts = [f"https://www.{name}.example.com" for name in
+             ("shop", "news", "docs", "mail", "maps", "video", "blog", "wiki")]
+    sections = ["products", "category", "articles", "users", "search", "static/img"]
+    return [f"{rng.choice(hosts)}/{rng.choice(sections)}/{rng.randrange(10**6)}/item-{i}"
+            for i in range(n)]
+
+
+def bench_radix_trie(n: int = 200_000) -> None:
+    words = synthetic_urls(n)
+    sorted_words = sorted(words)
+    probes = words[: n // 10] + [w + "x" for w in words[: n // 10]]
+    print(f"\n--- Trie vs RadixTrie, {n:,} URLs (avg {sum(map(len, words)) / n:.0f} chars) ---")
+
+    def build_trie() -> Trie:
+        t = Trie()
+        for w in words:
+            t.insert(w)
+        return t
+
+    def build_radix() -> RadixTrie:
+        t = RadixTrie()
+        for w in words:
+            t.insert(w)
+        return t
+
+    for label, build in [("Trie insert", build_trie),
+                         ("RadixTrie insert", build_radix),
+                         ("RadixTrie.from_sorted", lambda: RadixTrie.from_sorted(sorted_words)),
+                         ("FrozenRadixTrie", lambda: RadixTrie.from_sorted(sorted_words).freeze())]:
+        trie, secs, mem = retained(build)
+        t0 = time.perf_counter()
+        for w in probes:
+            trie.search(w)
+        search_secs = time.perf_counter() - t0
+        print(f"  {label:<24} build {secs * 1000:8.1f} ms  retained {mem / 2**20:8.1f} MiB"
+              f"  {len(probes):,} searches {search_secs * 1000:7.1f} ms")
+        del trie
+
+
+# =============================================================
+# 5) Trie autocomplete latency
+# =============================================================
+
+def _percentiles(samples: list) -> Tuple[float, float, float]:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return pick(0.50), pick(0.99), samples[-1]
+
+
+def bench_autocomplete(n: int = 200_000, queries: int = 100_000, k: int = 10) -> None:
+    rng = random.Random(7)
+    letters = "etaoinshrdlcumwfgypbvk"
+    words = {"".join(rng.choice(letters) for _ in range(rng.randint(3, 12))) for _ in range(n)}
+    weighted = [(w, int(1_000_000 / rng.randint(1, 10_000))) for w in words]  # Zipf-ish weights
+    print(f"\n--- Trie.complete, {len(weighted):,} words, k={k} ---")
+
+    def build(top_k: int) -> Trie:
+        t = Trie(top_k=top_k)
+        for w, weight in weighted:
+            t.insert(w, weight)
+        return t
+
+    # Keystroke-style prefixes: 1..4 leading characters of random words.
+    prefixes = [w[: rng.randint(1, 4)] for w, _ in rng.choices(weighted, k=queries)]
+    for label, top_k, nq in [("cached top_k=10", k, queries), ("uncached (subtree scan)", 0, queries // 100)]:
+        trie, secs, mem = retained(lambda: build(top_k))
+        lat = []
+        t_all = time.perf_counter()
+        for p in prefixes[:nq]:
+            t0 = time.perf_counter()
+            trie.complete(p, k)
+            lat.append(time.perf_counter() - t0)
+        total = time.perf_counter() - t_all
+        p50, p99, worst = _percentiles(lat)
+        print(f"  {label:<24} build {secs:6.2f} s {mem / 2**20:7.1f} MiB | {nq / total:10,.0f} q/s"
+              f"  p50 {p50 * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us  max {worst * 1e6:9.1f} us")
+        if top_k:
+            updates = rng.choices(weighted, k=queries // 10)
+            t0 = time.perf_counter()
+            for w, _ in updates:
+                trie.insert(w, rng.randint(1, 1_000_000))
+            secs = time.perf_counter() - t0
+            print(f"  {'weight updates':<24} {len(updates) / secs:10,.0f} updates/s")
+        del trie
+
+
+# =============================================================
+# 6) SegmentTree vs LazySegmentTree
+# =============================================================
+
+def _mixed_ops(n: int, count: int, seed: int = 3) -> list:
+    """(kind, l, r, x) with kind in {"query", "add", "assign"}; ~50% queries."""
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(count):
+        l = rng.randrange(n)
+        r = rng.randrange(l, n)
+        kind = rng.choice(("query", "query", "add", "assign"))
+        ops.append((kind, l, r, rng.randrange(-100, 100)))
+    return ops
+
+
+def bench_segment_trees(n: int = 10**5, count: int = 10**6, baseline_count: int = 200) -> None:
+    print(f"\n--- SegmentTree vs LazySegmentTree, n={n:,} ---")
+    arr = [random.randrange(1000) for _ in range(n)]
+
+    def run_lazy(ops: list) -> float:
+        st = LazySegmentTree(arr)
+        t0 = time.perf_counter()
+        for kind, l, r, x in ops:
+            if kind == "query":
+                st.query(l, r)
+            elif kind == "add":
+                st.range_add(l, r, x)
+            else:
+                st.range_assign(l, r, x)
+        return time.perf_counter() - t0
+
+    def run_point(ops: list) -> float:
+        """The old class can only emulate range updates with one point update per element."""
+        st = SegmentTree(arr)
+        cur = arr[:]
+        t0 = time.perf_counter()
+        for kind, l, r, x in ops:
+            if kind == "query":
+                st.range_sum(l, r)
+            else:
+                for i in range(l, r + 1):
+                    cur[i] = cur[i] + x if kind == "add" else x
+                    st.update(i, cur[i])
+        return time.perf_counter() - t0
+
+    ops = _mixed_ops(n, count)
+    secs = run_lazy(ops)
+    print(f"  LazySegmentTree  {count:>9,} mixed ops {secs:8.2f} s  ({count / secs:10,.0f} ops/s)")
+    secs = run_point(ops[:baseline_count])
+    print(f"  SegmentTree      {baseline_count:>9,} mixed ops {secs:8.2f} s  ({baseline_count / secs:10,.0f} ops/s)"
+          f"  -> ~{secs * count / baseline_count / 60:,.0f} min extrapolated to {count:,}")
+
+    # Overhead of the generic tree on the old class's own workload.
+    rng = random.Random(5)
+    point_ops = [(rng.randrange(n), rng.randrange(n), rng.randrange(1000)) for _ in range(count)]
+    for label, st in [("SegmentTree", SegmentTree(arr)), ("LazySegmentTree", LazySegmentTree(arr))]:
+        t0 = time.perf_counter()
+        for a, b, v in point_ops:
+            if a & 1:
+                st.update(a, v)
+            else:
+                st.range_sum(min(a, b), max(a, b))
+        secs = time.perf_counter() - t0
+        print(f"  {label:<16} {count:>9,} point update/sum ops {secs:6.2f} s  ({count / secs:10,.0f} ops/s)")
+
+
+def bench_segment_tree_batch(n: int = 10**6, queries: int = 10**6) -> None:
+    print(f"\n--- SegmentTree build + batched queries, n={n:,}, {queries:,} queries ---")
+    rng = random.Random(11)
+    arr = [rng.randrange(1000) for _ in range(n)]
+
+    def build_loop() -> list:
+        """The per-node Python loop SegmentTree.__init__ used before."""
+        size = 1 << (n - 1).bit_length()
+        tree = [0] * (2 * size)
+        tree[size:size + n] = arr
+        for i in range(size - 1, 0, -1):
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+        return tree
+
+    _, secs, _ = measure(build_loop)
+    _row("build, per-node loop", secs)
+    st, secs, _ = measure(lambda: SegmentTree(arr))
+    _row("build, level-wise map()", secs)
+
+    ls = [rng.randrange(n) for _ in range(queries)]
+    rs = [rng.randrange(l, n) for l in ls]
+    t0 = time.perf_counter()
+    for l, r in zip(ls, rs):
+        st.range_sum(l, r)
+    _row("range_sum per query", time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    st.range_sum_many(ls, rs)
+    _row("range_sum_many (prefix rebuild)", time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    st.range_sum_many(ls, rs)
+    _row("range_sum_many (cached prefix)", time.perf_counter() - t0)
+
+
+# =============================================================
+# 7) Persisting trees: JSON level list vs binary file
+# =============================================================
+
+def bench_tree_files(n: int = 10**6) -> None:
+    print(f"\n--- persist + reload a complete tree, n={n:,} ---")
+    root = build_tree_from_level_list(list(range(n)))
+    tmp = tempfile.mkdtemp()
+    json_path = os.path.join(tmp, "tree.json")
+    bin_path = os.path.join(tmp, "tree.bt")
+
+    def save_json() -> None:
+        with open(json_path, "w") as f:
+            json.dump(serialize_level(root), f)
+
+    def load_json() -> Any:
+        with open(json_path) as f:
+            return build_tree_from_level_list(json.load(f))
+
+    for label, fn in [("save: serialize_level + json", save_json),
+                      ("save: write_tree_binary", lambda: write_tree_binary(bin_path, root)),
+                      ("load: json + build_tree", load_json),
+                      ("load: read_tree_binary", lambda: read_tree_binary(bin_path))]:
+        _, secs, peak = measure(fn)
+        _row(label, secs, peak)
+    print(f"  file size: json {os.path.getsize(json_path) / 2**20:.1f} MiB,"
+          f" binary {os.path.getsize(bin_path) / 2**20:.1f} MiB")
+
+    def subtree_walk() -> int:
+        with MappedTree(bin_path) as t:
+            node = t.root
+            for _ in range(10):  # 10 levels down: a ~2**(h-10)-node subtree
+                node = node.left
+            return sum(preorder_lazy(node))
+
+    _, secs, peak = measure(subtree_walk)
+    _row("mmap: open + walk depth-10 subtree", secs, peak)
+    os.remove(json_path)
+    os.remove(bin_path)
+    os.rmdir(tmp)
+
+
+# =============================================================
+# 8) LCA: per-query walk vs LCAIndex
+# =============================================================
+
+def bench_lca(n: int = 10**6, queries: int = 10**6, baseline_queries: int = 5) -> None:
+    print(f"\n--- LCA on a complete tree, n={n:,} ---")
+    values = list(range(n))
+    root = build_tree_from_level_list(values)
+    nodes: list = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(c for c in (node.left, node.right) if c)
+    rng = random.Random(13)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(queries)]
+
+    t0 = time.perf_counter()
+    for p, q in pairs[:baseline_queries]:
+        lca_binary_tree(root, p, q)
+    per = (time.perf_counter() - t0) / baseline_queries
+    print(f"  lca_binary_tree        {per * 1000:9.1f} ms/query  (~{per * queries / 3600:,.1f} h for {queries:,})")
+    index, secs, mem = retained(lambda: LCAIndex(root))
+    _row("LCAIndex build", secs, mem)
+    t0 = time.perf_counter()
+    index.query_many(pairs)
+    secs = time.perf_counter() - t0
+    print(f"  LCAIndex.query_many    {secs:9.2f} s for {queries:,} ({queries / secs:,.0f} q/s)")
+
+
+# =============================================================
+# 9) Degenerate trees: every formerly recursive helper at depth 10^6
+# =============================================================
+
+def zigzag_chain(n: int) -> TreeNode:
+    """Depth n-1 chain alternating left and right children."""
+    root = cur = TreeNode(0)
+    for i in range(1, n):
+        child = TreeNode(i)
+        if i & 1:
+            cur.left = child
+        else:
+            cur.right = child
+        cur = child
+    return root
+
+
+def bench_deep_trees(n: int = 10**6) -> None:
+    print(f"\n--- degenerate trees, depth {n - 1:,} ---")
+    for shape, root in [("left chain", left_chain(n)), ("zigzag chain", zigzag_chain(n))]:
+        deepest = root
+        while deepest.left or deepest.right:
+            deepest = deepest.left or deepest.right
+        for label, fn in [("size", lambda: size(root)),
+                          ("height", lambda: height(root)),
+                          ("is_balanced", lambda: is_balanced(root)),
+                          ("diameter", lambda: diameter(root)),
+                          ("preorder_recursive", lambda: preorder_recursive(root)),
+                          ("inorder_recursive", lambda: inorder_recursive(root)),
+                          ("postorder_recursive", lambda: postorder_recursive(root)),
+                          ("root_to_leaf_paths", lambda: root_to_leaf_paths(root)),
+                          ("has_path_sum", lambda: has_path_sum(root, -1)),
+                          ("lca_binary_tree", lambda: lca_binary_tree(root, deepest, root.left or root.right))]:
+            _, secs, peak = measure(fn)
+            _row(f"{shape}: {label}", secs, peak)
+        del root, deepest
+
+    def skewed_bst() -> BST:
+        chain = None
+        for v in range(n - 1, -1, -1):  # right-leaning: 0 -> 1 -> 2 ...
+            chain = TreeNode(v, None, chain)
+        return BST(chain)
+
+    bst, secs, _ = measure(skewed_bst)
+    _row("skewed BST: build", secs)
+    _, secs, _ = measure(bst.validate_bst)
+    _row("skewed BST: validate_bst", secs)
+    t0 = time.perf_counter()
+    for key in (n - 1, n // 2, 0):
+        bst.delete(key)
+    _row("skewed BST: 3 deletes (deep/mid/root)", time.perf_counter() - t0)
+
+    nroot = cur = NaryNode(0, [])
+    for i in range(1, n):
+        nxt = NaryNode(i, [])
+        cur.children.append(nxt)
+        cur = nxt
+    _, secs, peak = measure(lambda: nary_dfs(nroot))
+    _row("N-ary chain: nary_dfs", secs, peak)
+
+
+# =============================================================
+# 10) BST metadata: O(1) reads vs full scans under churn
+# =============================================================
+
+def bench_bst_metadata(n: int = 10**5, ops: int = 10**5, checked: int = 2000) -> None:
+    print(f"\n--- BST size/height/balance after every mutation, n={n:,}, {ops:,} ops ---")
+    rng = random.Random(21)
+    keys = [rng.randrange(n * 2) for _ in range(ops)]
+    kinds = [rng.random() < 0.5 for _ in range(ops)]
+    for balanced in (False, True):
+        # Correctness: cross-check against the full-scan helpers on a smaller run.
+        bst = BST(balanced=balanced)
+        for key, add in zip(keys[:checked], kinds[:checked]):
+            (bst.insert if add else bst.delete)(key % (checked // 2))
+            assert len(bst) == size(bst.root)
+            assert bst.height() == height(bst.root)
+            assert bst.is_balanced() == is_balanced(bst.root)
+
+        label = "AVL  " if balanced else "plain"
+        bst = BST.from_iterable(rng.sample(range(n * 2), n), balanced=balanced)
+        t0 = time.perf_counter()
+        for key, add in zip(keys, kinds):
+            (bst.insert if add else bst.delete)(key)
+            len(bst), bst.height(), bst.is_balanced()
+        _row(f"{label} mutate + O(1) reads", time.perf_counter() - t0)
+        sample = 20
+        t0 = time.perf_counter()
+        for key, add in zip(keys[:sample], kinds[:sample]):
+            (bst.insert if add else bst.delete)(key)
+            size(bst.root), height(bst.root), is_balanced(bst.root)
+        per = (time.perf_counter() - t0) / sample
+        print(f"  {label} mutate + full scans  {per * 1000:9.1f} ms/op   (~{per * ops:,.0f} s for {ops:,})")
+
+
+# =============================================================
+# 11) Forests: process-pool scaling
+# =============================================================
+
+def random_forest(count: int, nodes: int, seed: int = 17) -> list:
+    """`count` random-insertion BSTs of `nodes` keys each, as compact ArrayTrees."""
+    rng = random.Random(seed)
+    forest = []
+    for _ in range(count):
+        bst = BST()
+        for key in rng.sample(range(nodes * 4), nodes):
+            bst.insert(key)
+        forest.append(ArrayTree.from_treenode(bst.root, "q"))
+    return forest
+
+
+def bench_forest(count: int = 2000, nodes: int = 500, max_workers: Optional[int] = None) -> None:
+    cores = os.cpu_count() or 1
+    max_workers = max_workers or max(cores, 2)
+    print(f"\n--- forest_stats over {count:,} trees x {nodes} nodes ({cores} cores) ---")
+    forest = random_forest(count, nodes)
+    target = nodes * 8
+    serial = [
+        {"size": size(t), "height": height(t), "diameter": diameter(t), "has_path_sum": has_path_sum(t, target)}
+        for t in forest
+    ]
+    base = None
+    for workers in range(1, max_workers + 1):
+        t0 = time.perf_counter()
+        result = forest_stats(forest, target_sum=target, workers=workers)
+        secs = time.perf_counter() - t0
+        assert result == serial
+        base = base or secs
+        print(f"  workers={workers:<2}             {secs:9.2f} s   speedup x{base / secs:4.2f}")
+
+
+# =============================================================
+# 12) CSR N-ary trees vs NaryNode
+# =============================================================
+
+def shaped_parents(shape: str, n: int, seed: int = 0) -> list:
+    """Parent array of an n-node N-ary tree: 8-ary complete, random recursive, or a chain."""
+    if shape == "balanced":
+        return [NIL] + [(i - 1) // 8 for i in range(1, n)]
+    if shape == "skewed":
+        return [NIL] + list(range(n - 1))
+    rng = random.Random(seed)
+    return [NIL] + [rng.randrange(i) for i in range(1, n)]
+
+
+def nary_from_parents(parents: list) -> NaryNode:
+    """The NaryNode baseline: one object and one child list per node."""
+    nodes = [NaryNode(i, []) for i in range(len(parents))]
+    root = None
+    for i, p in enumerate(parents):
+        if p == NIL:
+            root = nodes[i]
+        else:
+            nodes[p].children.append(nodes[i])
+    return root
+
+
+def bench_csr_tree(n: int = 10**6) -> None:
+    for shape in ("random", "balanced"):
+        print(f"\n--- N-ary tree, {shape} parents, n={n:,}: NaryNode vs CSRTree ---")
+        parents = shaped_parents(shape, n)
+        root, secs, mem = retained(lambda: nary_from_parents(parents))
+        _row("NaryNode build from parents", secs, mem)
+        csr, secs, mem = retained(lambda: CSRTree.from_parents(parents))
+        _row("CSRTree.from_parents", secs, mem)
+        for label, fn in [("nary_dfs(NaryNode)", lambda: nary_dfs(root)),
+                          ("nary_dfs(CSRTree)", lambda: nary_dfs(csr)),
+                          ("nary_bfs(NaryNode)", lambda: nary_bfs(root)),
+                          ("CSRTree.levels", csr.levels),
+                          ("CSRTree.frontiers (ids only)", lambda: _drain(csr.frontiers()))]:
+            _, secs, peak = measure(fn)
+            _row(label, secs, peak)
+        bfs_csr, secs, mem = retained(lambda: CSRTree.from_nary(root))
+        _row("CSRTree.from_nary (BFS-numbered)", secs, mem)
+        for label, fn in [("CSRTree.levels (BFS-numbered)", bfs_csr.levels),
+                          ("nary_bfs(CSRTree, BFS-numbered)", lambda: nary_bfs(bfs_csr)),
+                          ("CSRTree.to_nary", bfs_csr.to_nary)]:
+            _, secs, peak = measure(fn)
+            _row(label, secs, peak)
+        assert nary_dfs(csr) == nary_dfs(root) and csr.levels() == bfs_csr.levels()
+        del root, csr, bfs_csr
+
+
+# =============================================================
+# 13) Heaps: bulk build, max-heap, indexed decrease-key, k-way merge
+# =============================================================
+
+def random_graph(n: int, degree: int, seed: int = 23) -> list:
+    """Adjacency lists of a random directed graph with weights 1..100."""
+    rng = random.Random(seed)
+    return [[(rng.randrange(n), rng.randint(1, 100)) for _ in range(degree)] for _ in range(n)]
+
+
+def dijkstra_lazy(adj: list, src: int) -> list:
+    """Textbook heapq Dijkstra: push duplicates, skip stale entries on pop."""
+    dist = [math.inf] * len(adj)
+    dist[src] = 0
+    h = [(0, src)]
+    while h:
+        d, u = heapq.heappop(h)
+        if d > dist[u]:
+            continue
+        for v, w in adj[u]:
+            if d + w < dist[v]:
+                dist[v] = d + w
+                heapq.heappush(h, (d + w, v))
+    return dist
+
+
+def dijkstra_indexed(adj: list, src: int) -> list:
+    """Dijkstra with one live entry per vertex, lowered via decrease_key."""
+    dist = [math.inf] * len(adj)
+    dist[src] = 0
+    pq = IndexedHeap()
+    handle = {src: pq.push(src, 0)}
+    while pq:
+        u, d = pq.pop()
+        for v, w in adj[u]:
+            if d + w < dist[v]:
+                dist[v] = d + w
+                if v in handle and handle[v] in pq:
+                    pq.decrease_key(handle[v], d + w)
+                else:
+                    handle[v] = pq.push(v, d + w)
+    return dist
+
+
+def bench_heaps(n: int = 10**6, graph_n: int = 10**5, degree: int = 8, k: int = 64) -> None:
+    print(f"\n--- heaps, n={n:,} ---")
+    rng = random.Random(29)
+    nums = [rng.random() for _ in range(n)]
+
+    def push_each() -> list:
+        h: list = []
+        for x in nums:
+            heapq.heappush(h, x)
+        return h
+    for label, fn in [("build: heappush x n", push_each),
+                      ("build: MinHeap (heapify)", lambda: MinHeap(nums)),
+                      ("build: negated heapify (old max)", lambda: heapq.heapify([-x for x in nums])),
+                      ("build: MaxHeap", lambda: MaxHeap(nums))]:
+        _, secs, peak = measure(fn)
+        _row(label, secs, peak)
+    _, secs, peak = measure(lambda: demo_heap(nums))
+    _row("demo_heap (heapify + pops)", secs, peak)
+
+    adj = random_graph(graph_n, degree)
+    print(f"  Dijkstra on {graph_n:,} vertices x {degree} edges:")
+    ref, secs, peak = measure(lambda: dijkstra_lazy(adj, 0))
+    _row("heapq with stale entries", secs, peak)
+    got, secs, peak = measure(lambda: dijkstra_indexed(adj, 0))
+    _row("IndexedHeap.decrease_key", secs, peak)
+    assert got == ref
+
+    runs = [sorted(rng.random() for _ in range(n // k)) for _ in range(k)]
+    _, secs, peak = measure(lambda: _drain(kway_merge(iter(runs))))
+    _row(f"kway_merge of {k} runs (streamed)", secs, peak)
+    _, secs, peak = measure(lambda: sorted(itertools.chain.from_iterable(runs)))
+    _row(f"concatenate + sort {k} runs", secs, peak)
+
+
+# =============================================================
+# 14) pretty_print: per-node print() vs buffered pages
+# =============================================================
+
+def pretty_print_per_node(root: Optional[TreeNode], file: Any) -> None:
+    """The original renderer: recursive, one print() per node."""
+    def _pp(node: Optional[TreeNode], indent: str, last: bool) -> None:
+        if not node:
+            return
+        print(indent + ("└── " if last else "├── ") + str(node.val), file=file)
+        indent += "    " if last else "│   "
+        _pp(node.left, indent, False)
+        _pp(node.right, indent, True)
+    _pp(root, "", True)
+
+
+def bench_pretty_print(n: int = 10**6, deep_n: int = 10**4) -> None:
+    print(f"\n--- pretty_print of a random BST, n={n:,} ---")
+    keys = list(range(n))
+    random.Random(31).shuffle(keys)
+    root = BST.from_iterable(keys).root
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        for label, fn in [("per-node print() to devnull", lambda: pretty_print_per_node(root, sink)),
+                          ("pretty_print to devnull", lambda: pretty_print(root, sink)),
+                          ("pretty_print max_depth=10", lambda: pretty_print(root, sink, max_depth=10)),
+                          ("pretty_print max_nodes=1000", lambda: pretty_print(root, sink, max_nodes=1000)),
+                          ("first page only (64 KiB)", lambda: next(pretty_pages(root)))]:
+            _, secs, peak = measure(fn)
+            _row(label, secs, peak)
+        # Degenerate trees: lines grow ~4 chars per level, so memory must be
+        # bounded by page size (plus one line), not by lines per page.
+        for chain_label, chain in (("left chain", left_chain), ("zigzag chain", zigzag_chain)):
+            deep = chain(deep_n)
+            _, secs, peak = measure(lambda: pretty_print(deep, sink))
+            _row(f"{chain_label}, depth {deep_n:,}", secs, peak)
+            del deep
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.txt")
+        _, secs, peak = measure(lambda: pretty_print(root, path))
+        _row(f"pretty_print to a file ({os.path.getsize(path) / 2**20:.0f} MiB)", secs, peak)
+
+
+# =============================================================
+# 15) Persistent BST: path copying and memory shared between versions
+# =============================================================
+
+def distinct_nodes(roots: list) -> int:
+    """Nodes reachable from any of the roots, counting shared subtrees once."""
+    seen: set = set()
+    stack = [r for r in roots if r]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        stack.extend(c for c in (node.left, node.right) if c)
+    return len(seen)
+
+
+def bench_persistent_bst(n: int = 10**6, updates: int = 10**4, readers: int = 4) -> None:
+    print(f"\n--- PersistentBST, n={n:,}, {updates:,} updates ---")
+    rng = random.Random(37)
+    batches = [[(rng.random() < 0.5, rng.randrange(2 * n)) for _ in range(updates)] for _ in range(3)]
+
+    def churn(tree: BST, ops: list) -> list:
+        roots = []
+        for add, key in ops:
+            (tree.insert if add else tree.delete)(key)
+            if isinstance(tree, PersistentBST):
+                roots.append(tree.snapshot().root)
+        return roots
+    avl = BST.from_sorted(range(0, 2 * n, 2), balanced=True)
+    t0 = time.perf_counter()
+    churn(avl, batches[0])
+    _row("in-place AVL updates", time.perf_counter() - t0)
+    del avl
+
+    tree, secs, base = retained(lambda: PersistentBST.from_sorted(range(0, 2 * n, 2)))
+    _row("PersistentBST.from_sorted", secs, base)
+    t0 = time.perf_counter()
+    churn(tree, batches[0])
+    _row("path-copying updates + snapshot()", time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    versions = churn(tree, batches[1])
+    extra, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {updates:,} more versions retain {extra / 2**20:.1f} MiB")
+    copied = distinct_nodes(versions) - n
+    print(f"  all {updates + 1:,} versions: {copied:,} extra nodes ({copied / updates:.1f} per update);"
+          f" full copies would hold {updates * n:,}")
+    print(f"  retained per version {extra / updates / 1024:.1f} KiB vs {base / 2**20:.0f} MiB per full copy")
+
+    # Lock-free readers: each thread repeatedly takes a snapshot and checks it
+    # is internally consistent while the writer keeps publishing new versions.
+    import threading
+    stop = threading.Event()
+    checked = [0] * readers
+
+    def reader(slot: int) -> None:
+        while not stop.is_set():
+            snap = tree.snapshot()
+            keys = list(itertools.islice(inorder_lazy(snap.root), 1000))
+            assert keys == sorted(keys) and snap.kth_smallest(1) == keys[0]
+            checked[slot] += 1
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    t0 = time.perf_counter()
+    churn(tree, batches[2])
+    secs = time.perf_counter() - t0
+    stop.set()
+    for t in threads:
+        t.join()
+    _row(f"updates with {readers} reader threads", secs)
+    print(f"  readers validated {sum(checked):,} snapshots without locks")
+
+
+# =============================================================
+# 16) ShardedTrie: concurrent ingestion, 1..N threads
+# =============================================================
+
+def bench_sharded_trie(n: int = 400_000, max_threads: Optional[int] = None, batch: int = 1000) -> None:
+    import threading
+    max_threads = max_threads or max(os.cpu_count() or 1, 4)
+    print(f"\n--- Trie ingestion of {n:,} words from 1..{max_threads} threads"
+          f" ({os.cpu_count()} cores, GIL {'on' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'off'}) ---")
+    rng = random.Random(41)
+    words = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randrange(4, 13))) for _ in range(n)]
+
+    def global_lock(chunk: list, state: dict) -> None:
+        trie, lock = state["trie"], state["lock"]
+        for w in chunk:
+            with lock:
+                trie.insert(w)
+
+    def sharded(chunk: list, state: dict) -> None:
+        insert = state["trie"].insert
+        for w in chunk:
+            insert(w)
+
+    def sharded_batches(chunk: list, state: dict) -> None:
+        trie = state["trie"]
+        for i in range(0, len(chunk), batch):
+            trie.insert_many(chunk[i:i + batch])
+
+    def private_then_merge(chunk: list, state: dict) -> None:
+        local = Trie()
+        for w in chunk:
+            local.insert(w)
+        state["trie"].merge([local])  # merge takes the shard locks itself
+
+    modes = [("Trie + one global lock", global_lock, lambda: Trie()),
+             ("ShardedTrie.insert", sharded, ShardedTrie),
+             (f"ShardedTrie.insert_many({batch})", sharded_batches, ShardedTrie),
+             ("per-thread Trie + merge", private_then_merge, ShardedTrie)]
+    for label, work, make in modes:
+        print(f"  {label}:")
+        for threads in range(1, max_threads + 1):
+            state = {"trie": make(), "lock": threading.Lock()}
+            chunks = [words[i::threads] for i in range(threads)]
+            workers = [threading.Thread(target=work, args=(c, state)) for c in chunks]
+            gc.collect()
+            t0 = time.perf_counter()
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+            secs = time.perf_counter() - t0
+            trie = state["trie"]
+            assert all(trie.search(w) for w in words[::997])
+            print(f"    threads={threads:<2}        {secs:7.2f} s   {n / secs:12,.0f} words/s")
+            del state, trie, workers  # free this run's nodes before timing the next
+
+
+def stress_sharded_trie_reads(seconds: float = 3.0, readers: int = 2) -> None:
+    """Lock-free reads racing writers on the same shard, with no top-k cache,
+    so complete() walks the live subtree. Any exception in a reader fails it."""
+    import threading
+    print(f"\n--- ShardedTrie: {readers} lock-free readers vs 1 writer for {seconds:.0f} s (top_k=0) ---")
+    trie = ShardedTrie(shards=4)
+    # A small subtree, so readers spend most of their time iterating the
+    # children dict of "a" that the writer keeps growing and pruning.
+    trie.insert_many("a" + chr(97 + i % 26) * (1 + i // 26) for i in range(200))
+    stop = threading.Event()
+    errors: list = []
+    counts = [0] * (readers + 1)
+
+    def writer() -> None:
+        i = 0
+        while not stop.is_set():
+            word = "a" + chr(0x100 + i % 512)
+            trie.insert(word)
+            trie.insert(word + "x")
+            trie.delete(word + "x")  # prunes a leaf the readers may be standing on
+            trie.delete(word)
+            i += 1
+        counts[-1] = i
+
+    def reader(slot: int) -> None:
+        try:
+            while not stop.is_set():
+                trie.complete("a", 5)
+                trie.complete("", 5)  # fans out over every shard
+                trie.search("a\u0101x")
+                trie.starts_with("a\u0102x")
+                counts[slot] += 1
+        except Exception as error:
+            errors.append(repr(error))
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+    print(f"  {sum(counts[:-1]):,} read rounds against {counts[-1]:,} write rounds, no errors")
+
+
+# =============================================================
+# 17) BST key ranges: range() vs scan+filter, delete_range vs per-key delete
+# =============================================================
+
+def bench_bst_range(n: int = 10**6, queries: int = 10**4, width: int = 100,
+                    scans: int = 20, expire: int = 50) -> None:
+    print(f"\n--- BST ranges, n={n:,}, {width}-key windows ---")
+    rng = random.Random(41)
+    los = [rng.randrange(n - width) for _ in range(queries)]
+    avl = BST.from_sorted(range(n), balanced=True)
+
+    def scan(lo: int) -> list:
+        return [k for k in inorder_lazy(avl.root) if lo <= k < lo + width]
+    t0 = time.perf_counter()
+    for lo in los[:scans]:
+        scan(lo)
+    per_scan = (time.perf_counter() - t0) / scans
+    t0 = time.perf_counter()
+    for lo in los:
+        assert len(list(avl.range(lo, lo + width - 1))) == width
+    per_range = (time.perf_counter() - t0) / queries
+    print(f"  inorder_lazy + filter  {per_scan * 1e3:9.3f} ms/query")
+    print(f"  range(lo, hi)          {per_range * 1e3:9.3f} ms/query  ({per_scan / per_range:,.0f}x)")
+    del avl
+
+    # Expire `expire` disjoint windows, oldest keys first, from a tree of n keys.
+    keys = list(range(n))
+    rng.shuffle(keys)
+    windows = [(i * n // expire, i * n // expire + n // (4 * expire)) for i in range(expire)]
+    removed = sum(hi - lo + 1 for lo, hi in windows)
+    for label, make in (("plain BST", lambda: BST.from_iterable(keys)),
+                        ("AVL", lambda: BST.from_sorted(range(n), balanced=True)),
+                        ("PersistentBST", lambda: PersistentBST.from_sorted(range(n)))):
+        tree = make()
+        t0 = time.perf_counter()
+        for lo, hi in windows:
+            for k in range(lo, hi + 1):
+                tree.delete(k)
+        per_key = time.perf_counter() - t0
+        del tree
+        tree = make()
+        t0 = time.perf_counter()
+        assert sum(tree.delete_range(lo, hi) for lo, hi in windows) == removed
+        bulk = time.perf_counter() - t0
+        assert len(tree) == n - removed
+        print(f"  {label:14s} {removed:,} keys: per-key delete {per_key:7.3f} s,"
+              f" delete_range {bulk * 1e3:8.2f} ms ({per_key / bulk:,.0f}x)")
+        del tree
+
+
+# =============================================================
+# 18) Regression suite: every structure x shape x size, as JSON
+# =============================================================
+
+SHAPES = ("balanced", "random", "skewed")
+SUITE_SIZES = (10**3, 10**4, 10**5, 10**6)
+# Plain BST on skewed input is O(n^2) to build; above this n it is skipped.
+QUADRATIC_CAP = 10**3
+
+
+def shaped_keys(shape: str, n: int, seed: int = 0) -> list:
+    """Keys 0..n-1 in an insertion order that yields the given BST shape."""
+    if shape == "skewed":
+        return list(range(n))
+    if shape == "random":
+        keys = list(range(n))
+        random.Random(seed).shuffle(keys)
+        return keys
+    # balanced: midpoints in BFS order, so each insert lands on the bottom level
+    out = []
+    q = [(0, n - 1)]
+    for lo, hi in q:
+        if lo <= hi:
+            mid = (lo + hi) // 2
+            out.append(mid)
+            q.append((lo, mid - 1))
+            q.append((mid + 1, hi))
+    return out
+
+
+def shaped_level_list(shape: str, n: int, seed: int = 0) -> list:
+    """Level-order list (None for gaps) of an n-node binary tree of the given shape."""
+    if shape == "balanced":
+        return list(range(n))
+    if shape == "skewed":
+        out = [0]
+        for i in range(1, n):
+            out += [i, None]  # left child only: a depth n-1 chain
+        return out[:-1] if n > 1 else out
+    return serialize_level(BST.from_iterable(shaped_keys("random", n, seed)).root)
+
+
+def shaped_words(shape: str, n: int, seed: int = 0) -> list:
+    """n distinct words: uniform fixed-width, random lengths, or one long shared prefix."""
+    def encode(k: int, width: int) -> str:
+        chars = []
+        for _ in range(width):
+            k, r = divmod(k, 26)
+            chars.append(chr(97 + r))
+        return "".join(chars)
+    width = max(1, math.ceil(math.log(max(n, 2), 26)))
+    if shape == "balanced":
+        return [encode(k, width) for k in range(n)]
+    if shape == "skewed":
+        return ["a" * 24 + encode(k, width) for k in range(n)]
+    rng = random.Random(seed)
+    return [encode(k, width) + "".join(rng.choices("abcdefghij", k=rng.randrange(0, 8))) for k in range(n)]
+
+
+def profile(fn: Callable[[], Any], min_time: float = 0.2, max_runs: int = 5) -> Tuple[float, int, int]:
+    """Best wall time over up to max_runs runs (stopping once min_time has been
+    spent), then one run under tracemalloc. Returns (seconds, peak bytes, runs)."""
+    best = float("inf")
+    total = 0.0
+    runs = 0
+    while runs < max_runs and (runs == 0 or total < min_time):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, runs
+
+
+def suite_cases(shape: str, n: int) -> Iterable[Tuple[str, Optional[Callable[[], Any]]]]:
+    """Yield (case name, thunk) pairs; a None thunk means the case is skipped at this size.
+    Fixtures are built between yields so only one shape/size is resident at a time."""
+    keys = shaped_keys(shape, n)
+    queries = min(n, 10**5)
+    rng = random.Random(n)
+    probes = [rng.randrange(n) for _ in range(queries)]
+
+    quadratic = shape == "skewed" and n > QUADRATIC_CAP
+    for balanced, name in ((False, "BST"), (True, "AVL")):
+        if not balanced and quadratic:
+            for op in ("insert", "search", "kth_smallest", "delete"):
+                yield f"{name}.{op}", None
+            continue
+        yield f"{name}.insert", lambda: BST.from_iterable(keys, balanced=balanced)
+        bst = BST.from_iterable(keys, balanced=balanced)
+        yield f"{name}.search", lambda: [bst.search(k) for k in probes]
+        yield f"{name}.kth_smallest", lambda: [bst.kth_smallest(k + 1) for k in probes]
+
+        def delete_all() -> None:
+            # Includes an O(n) from_sorted build so every run starts from a full tree.
+            victim = BST.from_sorted(range(n), balanced=balanced)
+            for k in keys:
+                victim.delete(k)
+        yield f"{name}.delete", delete_all
+        del bst
+    yield "BST.from_sorted", lambda: BST.from_sorted(range(n))
+    yield "PersistentBST.insert", lambda: PersistentBST.from_iterable(keys)
+    avl = BST.from_sorted(range(n), balanced=True)
+    yield "AVL.range", lambda: [_drain(avl.range(k, k + 99)) for k in probes]
+
+    def expire_windows() -> None:
+        victim = BST.from_sorted(range(n), balanced=True)
+        for lo in range(0, n, 100):
+            victim.delete_range(lo, lo + 49)
+    yield "AVL.delete_range", expire_windows
+    del avl
+
+    level = shaped_level_list(shape, n)
+    yield "build_tree_from_level_list", lambda: build_tree_from_level_list(level)
+    yield "build_tree_from_level_list.compact", lambda: build_tree_from_level_list(level, compact=True)
+    root = build_tree_from_level_list(level)
+    del level
+    yield "serialize_level", lambda: serialize_level(root)
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        yield "pretty_print", lambda: pretty_print(root, sink)
+    yield "ArrayTree.from_treenode", lambda: ArrayTree.from_treenode(root)
+    for fn in (preorder_iterative, inorder_iterative, postorder_iterative, level_order, zigzag_level_order):
+        yield f"traversal.{fn.__name__}", functools.partial(fn, root)
+    for fn in (preorder_lazy, inorder_lazy, postorder_lazy, morris_inorder):
+        yield f"traversal.{fn.__name__}", functools.partial(_drain_call, functools.partial(fn, root))
+    compact = ArrayTree.from_treenode(root)
+    yield "traversal.ArrayTree.inorder", compact.inorder
+    yield "traversal.ArrayTree.levels", compact.levels
+    del root, compact
+
+    words = shaped_words(shape, n)
+    prefixes = [words[i][: max(1, len(words[i]) // 2)] for i in probes]
+
+    def build_trie() -> Trie:
+        trie = Trie()
+        for w in words:
+            trie.insert(w)
+        return trie
+    yield "Trie.insert", build_trie
+    trie = build_trie()
+    yield "Trie.search", lambda: [trie.search(words[i]) for i in probes]
+    yield "Trie.starts_with", lambda: [trie.starts_with(p) for p in prefixes]
+    yield "ShardedTrie.insert_many", lambda: ShardedTrie().insert_many(words)
+    del trie
+    yield "RadixTrie.from_sorted", lambda: RadixTrie.from_sorted(sorted(words))
+    del words, prefixes
+
+    yield "SegmentTree.build", lambda: SegmentTree(keys)
+    seg = SegmentTree(keys)
+    pairs = [(min(a, b), max(a, b)) for a, b in zip(probes, reversed(probes))]
+
+    def updates() -> None:
+        for i in probes:
+            seg.update(i, i)
+    yield "SegmentTree.update", updates
+    yield "SegmentTree.range_sum", lambda: [seg.range_sum(l, r) for l, r in pairs]
+    yield "SegmentTree.range_sum_many", lambda: seg.range_sum_many([l for l, _ in pairs], [r for _, r in pairs])
+    del seg
+    yield "LazySegmentTree.range_add+query", lambda: _lazy_mix(keys, pairs)
+
+    yield "demo_heap", lambda: demo_heap(keys)
+    yield "MaxHeap.build+drain", lambda: _drain(MaxHeap(keys).drain())
+
+    def indexed_churn() -> None:
+        pq = IndexedHeap(zip(keys, keys))
+        for k in probes:
+            pq.decrease_key(k, -k)  # bulk build gives handle == position in keys
+        while pq:
+            pq.pop()
+    yield "IndexedHeap.build+decrease_key+drain", indexed_churn
+
+    parents = shaped_parents(shape, n)
+    yield "CSRTree.from_parents", lambda: CSRTree.from_parents(parents)
+    csr = CSRTree.from_parents(parents)
+    del parents
+    yield "CSRTree.dfs", csr.dfs
+    yield "CSRTree.levels", csr.levels
+    yield "CSRTree.to_nary", csr.to_nary
+    yield "CSRTree.from_nary", functools.partial(CSRTree.from_nary, csr.to_nary())
+
+
+def _drain_call(make: Callable[[], Any]) -> None:
+    _drain(make())
+
+
+def _lazy_mix(keys: list, pairs: list) -> None:
+    lst = LazySegmentTree(keys)
+    for l, r in pairs:
+        lst.range_add(l, r, 1)
+        lst.query(l, r)
+
+
+def run_suite(sizes: Iterable[int] = SUITE_SIZES, shapes: Iterable[str] = SHAPES,
+              cases: Optional[str] = None) -> dict:
+    """Run every case, print a row per case, and return the JSON-ready report.
+    `cases` is an optional substring filter on case names."""
+    results = []
+    for n in sizes:
+        for shape in shapes:
+            print(f"\n--- suite: {shape}, n={n:,} ---")
+            for case, fn in suite_cases(shape, n):
+                if cases and cases not in case:
+                    continue
+                entry: dict = {"case": case, "shape": shape, "n": n}
+                if fn is None:
+                    entry["skipped"] = f"quadratic on {shape} input above n={QUADRATIC_CAP:,}"
+                    print(f"  {case:<34}   skipped")
+                else:
+                    secs, peak, runs = profile(fn)
+                    entry.update(seconds=secs, peak_bytes=peak, runs=runs)
+                    _row(case, secs, peak)
+                results.append(entry)
+    return {"meta": _suite_meta(), "results": results}
+
+
+def _suite_meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float = 0.25,
+                    min_seconds: float = 1e-3, min_bytes: int = 64 * 1024) -> List[str]:
+    """Cases in `current` slower or larger than `baseline` by more than `tolerance`.
+    Differences under min_seconds / min_bytes are treated as noise."""
+    before = {(r["case"], r["shape"], r["n"]): r for r in baseline["results"] if "seconds" in r}
+    regressions = []
+    for r in current["results"]:
+        old = before.get((r["case"], r["shape"], r["n"]))
+        if old is None or "seconds" not in r:
+            continue
+        label = f"{r['case']} [{r['shape']}, n={r['n']:,}]"
+        if r["seconds"] > old["seconds"] * (1 + tolerance) and r["seconds"] - old["seconds"] > min_seconds:
+            regressions.append(f"{label}: time {old['seconds'] * 1000:.1f} -> {r['seconds'] * 1000:.1f} ms")
+        if r["peak_bytes"] > old["peak_bytes"] * (1 + tolerance) and r["peak_bytes"] - old["peak_bytes"] > min_bytes:
+            regressions.append(f"{label}: peak {old['peak_bytes'] / 2**20:.1f} -> {r['peak_bytes'] / 2**20:.1f} MiB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="store_true", help="run the regression suite instead of the bench_* reports")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES))
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument("--cases", help="only run suite cases whose name contains this string")
+    parser.add_argument("--json", help="write the suite report to this path")
+    parser.add_argument("--baseline", help="compare against a previous --json report")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    if not args.suite:
+        bench_array_tree()
+        bench_bst_sorted()
+        bench_traversal_modes()
+        bench_radix_trie()
+        bench_autocomplete()
+        bench_segment_trees()
+        bench_segment_tree_batch()
+        bench_tree_files()
+        bench_lca()
+        bench_deep_trees()
+        bench_bst_metadata()
+        bench_forest()
+        bench_csr_tree()
+        bench_heaps()
+        bench_pretty_print()
+        bench_persistent_bst()
+        bench_sharded_trie()
+        stress_sharded_trie_reads()
+        bench_bst_range()
+        return 0
+
+    report = run_suite(args.sizes, args.shapes, args.cases)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nwrote {len(report['results'])} results to {args.json}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.tolerance)
+        print(f"\n{len(regressions)} regression(s) vs {args.baseline} (tolerance {args.tolerance:.0%})")
+        for line in regressions:
+            print("  " + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
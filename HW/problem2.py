@@ -1,16 +1,100 @@
+import asyncio
+import csv
 import heapq
+import json
+import multiprocessing
+import os
 import random
+import struct
+import sys
+from array import array
+import zlib
+from collections import namedtuple
+
+# One per record handed to bulk_book. status is "Booked", "Waiting",
+# "Taken" (wanted seat already booked), "Invalid" (bad seat code or
+# missing fields) or "Duplicate" (name already on the flight).
+BookingResult = namedtuple("BookingResult", ["index", "name", "status", "seat"])
+
+RECORD_FIELDS = ("first", "last", "dob", "address", "seat")
+
+# Snapshot file: header, then per passenger its seat number (-1 when on the
+# waitlist) and waitlist ticket (0 when seated), then the char lengths of its
+# name, dob, address and first name (first name only kept for waitlisted
+# passengers, to rebuild their heap entries), then all those strings as one
+# UTF-8 blob. Numbers are little-endian throughout, columns included.
+SNAPSHOT_MAGIC = b"FLT1"
+SNAPSHOT_HEADER = struct.Struct("<4sIIQQQ")  # magic, rows, cols, passengers, ticket_number, generation
+
+encode_op = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class Journal:
+    """Append-only operation log: one JSON list per line. Lines are buffered
+    and flushed + fsync'd once every sync_every operations (and on sync()),
+    so a crash can lose at most the last unsynced batch."""
+
+    def __init__(self, path, sync_every=1000):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.sync_every = sync_every
+        self.pending = 0
+
+    def append(self, op):
+        self.file.write(encode_op(op) + "\n")
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        if self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    @staticmethod
+    def replay(path):
+        """Yield the operations logged in path. A torn last line (the process
+        died mid-write) ends the replay and is cut off the file, so appends
+        after recovery start on a clean line."""
+        if not os.path.exists(path):
+            return
+        with open(path, "r+b") as f:
+            good = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                yield op
+            f.truncate(good)
+
 
 class FlightManager:
-    def __init__(self):
-        print("--- SYSTEM STARTUP ---")
-        try:
-            self.rows = int(input("How many rows? "))
-            self.cols = int(input("How many columns? "))
-        except ValueError:
-            print("Invalid number. Using default 2 rows, 3 columns.")
-            self.rows = 2
-            self.cols = 3
+    def __init__(self, rows=None, cols=None, quiet=False):
+        # Without rows/cols the seat map size is asked for interactively.
+        # quiet=True silences every message, for batch and programmatic use.
+        self.quiet = quiet
+        if rows is None or cols is None:
+            print("--- SYSTEM STARTUP ---")
+            try:
+                self.rows = int(input("How many rows? "))
+                self.cols = int(input("How many columns? "))
+            except ValueError:
+                print("Invalid number. Using default 2 rows, 3 columns.")
+                self.rows = 2
+                self.cols = 3
+        else:
+            self.rows, self.cols = int(rows), int(cols)
+            if self.rows < 1 or self.cols < 1:
+                raise ValueError(f"seat map must be at least 1 x 1, got {rows} x {cols}")
 
         self.seats = []
         for r in range(self.rows):
@@ -18,14 +102,203 @@ class FlightManager:
             for c in range(self.cols):
                 new_row.append(None)
             self.seats.append(new_row)
+
+        # Free-seat index: every empty seat's number (r * cols + c) sits in
+        # free_seats, and free_pos[number] is where, or -1 once it is taken.
+        # Taking a seat swaps the last entry into its slot, so picking a random
+        # free seat, taking one and releasing one are all O(1).
+        self.free_seats = list(range(self.rows * self.cols))
+        self.free_pos = list(range(self.rows * self.cols))
         
         self.passenger_data = {}
         
         self.waiting_list = [] 
         self.ticket_number = 0 
 
-        print(f"Seat map initialized: {self.rows} x {self.cols}")
-        self.show_seats(show_names=False)
+        # Persistence, set up by FlightManager.open(): the journal every state
+        # change is logged to, and a snapshot is taken every snapshot_every ops.
+        self.journal = None
+        self.directory = None
+        self.generation = 0
+        self.snapshot_every = None
+        self.ops_since_snapshot = 0
+
+        if not quiet:
+            print(f"Seat map initialized: {self.rows} x {self.cols}")
+            self.show_seats(show_names=False)
+
+    def say(self, message):
+        if not self.quiet:
+            print(message)
+
+    # --- Persistence: journal + snapshots ---
+
+    @classmethod
+    def open(cls, directory, rows=None, cols=None, quiet=True, sync_every=1000, snapshot_every=None):
+        """Open (or create) a durable flight stored in `directory`.
+
+        A new flight needs rows and cols. An existing one is recovered by
+        loading snapshot.bin and replaying only journal.<generation>.log, the
+        operations logged since that snapshot. Every later booking and
+        cancellation is journaled; call close() to sync the last batch.
+        """
+        os.makedirs(directory, exist_ok=True)
+        snapshot = os.path.join(directory, "snapshot.bin")
+        if os.path.exists(snapshot):
+            manager = cls.load_snapshot(snapshot)
+            if (rows is not None and int(rows) != manager.rows) or (cols is not None and int(cols) != manager.cols):
+                raise ValueError(f"{directory} holds a {manager.rows} x {manager.cols} flight, "
+                                 f"not {rows} x {cols}")
+        else:
+            if rows is None or cols is None:
+                raise ValueError(f"{directory} holds no flight yet: rows and cols are required")
+            manager = cls(rows, cols, quiet=True)
+            manager.directory = directory
+            manager.save_snapshot()  # so a reopen knows the seat map size
+        manager.directory = directory
+        manager.remove_stale_files()
+        journal = manager.journal_path(manager.generation)
+        for op in Journal.replay(journal):
+            manager.apply(op)  # still quiet: no message per replayed op
+        manager.journal = Journal(journal, sync_every)
+        manager.snapshot_every = snapshot_every
+        manager.quiet = quiet
+        return manager
+
+    def journal_path(self, generation):
+        return os.path.join(self.directory, f"journal.{generation}.log")
+
+    def remove_stale_files(self):
+        """Delete what a crash in checkpoint() can leave behind: journals older
+        than the snapshot's generation (already folded into it) and a
+        half-written snapshot temp file."""
+        for entry in os.listdir(self.directory):
+            parts = entry.split(".")
+            stale = entry == "snapshot.bin.tmp" or (
+                len(parts) == 3 and parts[0] == "journal" and parts[2] == "log"
+                and parts[1].isdigit() and int(parts[1]) < self.generation)
+            if stale:
+                os.remove(os.path.join(self.directory, entry))
+
+    def apply(self, op):
+        """Redo one journaled operation. Bookings carry the seat they got, so
+        random auto-assignment replays exactly; a cancel redoes its waitlist
+        promotion, which depends only on the state."""
+        if op[0] == "B":
+            _, first, last, birthday, address, seat = op
+            if seat == "Waitlist":
+                self.add_to_waitlist(first, last, birthday, address)
+            else:
+                r, c = self.get_indices(seat)
+                self.save_booking(r, c, f"{first} {last}", birthday, address)
+        elif op[0] == "C":
+            self.cancel_passenger(op[1], op[2])
+        else:
+            raise ValueError(f"unknown journal operation {op[0]!r}")
+
+    def record(self, op):
+        if self.journal is None:
+            return
+        self.journal.append(op)
+        self.ops_since_snapshot += 1
+        if self.snapshot_every and self.ops_since_snapshot >= self.snapshot_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Write a snapshot of the current state and start a new, empty
+        journal. The snapshot goes to a temp file that is fsync'd and then
+        renamed over snapshot.bin, so a crash at any point leaves either the
+        old snapshot + old journal or the new snapshot to recover from."""
+        self.journal.close()
+        old = self.journal.path
+        self.generation += 1
+        self.save_snapshot()
+        self.journal = Journal(self.journal_path(self.generation), self.journal.sync_every)
+        os.remove(old)
+        self.ops_since_snapshot = 0
+
+    def save_snapshot(self):
+        path = os.path.join(self.directory, "snapshot.bin")
+        with open(path + ".tmp", "wb") as f:
+            self.write_snapshot(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        # Make the rename itself durable before the old journal is removed.
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def write_snapshot(self, f):
+        seats, tickets, lengths, strings = array("q"), array("q"), array("I"), []
+        for name, info in self.passenger_data.items():
+            if info["status"] == "Waiting":
+                seats.append(-1)
+                tickets.append(info["ticket"])
+                first = info["first"]
+            else:
+                r, c = self.get_indices(info["seat"])
+                seats.append(r * self.cols + c)
+                tickets.append(0)
+                first = ""
+            for text in (name, info["dob"], info["address"], first):
+                lengths.append(len(text))
+                strings.append(text)
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.rows, self.cols, len(seats),
+                                     self.ticket_number, self.generation))
+        for column in (seats, tickets, lengths):
+            if sys.byteorder == "big":
+                column.byteswap()
+            f.write(column.tobytes())
+        f.write("".join(strings).encode("utf-8"))
+
+    @classmethod
+    def load_snapshot(cls, path, quiet=True):
+        # Rebuilds through save_booking quietly; quiet only applies afterwards.
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, rows, cols, count, ticket_number, generation = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a flight snapshot")
+        manager = cls(rows, cols, quiet=True)
+        pos = SNAPSHOT_HEADER.size
+        columns = []
+        for typecode, n in (("q", count), ("q", count), ("I", 4 * count)):
+            column = array(typecode)
+            column.frombytes(data[pos:pos + n * column.itemsize])
+            pos += n * column.itemsize
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+        seats, tickets, lengths = columns
+        text = data[pos:].decode("utf-8")
+        at = 0
+        for i in range(count):
+            fields = []
+            for n in lengths[4 * i:4 * i + 4]:
+                fields.append(text[at:at + n])
+                at += n
+            name, dob, address, first = fields
+            if seats[i] < 0:
+                last = name[len(first) + 1:]
+                manager.waiting_list.append((tickets[i], {"first": first, "last": last, "dob": dob, "addr": address}))
+                manager.passenger_data[name] = {"dob": dob, "address": address, "seat": "Waitlist",
+                                                "status": "Waiting", "ticket": tickets[i], "first": first}
+            else:
+                r, c = divmod(seats[i], cols)
+                manager.save_booking(r, c, name, dob, address)
+        heapq.heapify(manager.waiting_list)
+        manager.ticket_number = ticket_number
+        manager.generation = generation
+        manager.quiet = quiet
+        return manager
 
     def get_seat_name(self, row_index, col_index):
         row_string = str(row_index + 1)
@@ -40,13 +313,26 @@ class FlightManager:
         except:
             return None, None
 
+    def take_seat(self, r, c):
+        number = r * self.cols + c
+        i = self.free_pos[number]
+        last = self.free_seats.pop()
+        if last != number:
+            self.free_seats[i] = last
+            self.free_pos[last] = i
+        self.free_pos[number] = -1
+
+    def release_seat(self, r, c):
+        number = r * self.cols + c
+        self.free_pos[number] = len(self.free_seats)
+        self.free_seats.append(number)
+
+    def count_empty_seats(self):
+        return len(self.free_seats)
+
     def get_empty_seats(self):
-        empty_spots = []
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.seats[r][c] is None:
-                    empty_spots.append(self.get_seat_name(r, c))
-        return empty_spots
+        # Only the free seats are visited, listed in seat-map order.
+        return [self.get_seat_name(*divmod(number, self.cols)) for number in sorted(self.free_seats)]
 
     def show_seats(self, show_names=False):
         print("\n--- SEAT MAP ---")
@@ -68,38 +354,76 @@ class FlightManager:
         print("\n")
 
     def add_passenger(self, first, last, birthday, address, wanted_seat=None):
+        """Book a seat (wanted_seat, or a random free one) and return
+        (status, seat) with status as in BookingResult."""
+        status, seat = self.place_passenger(first, last, birthday, address, wanted_seat)
+        if status == "Booked" or status == "Waiting":
+            self.record(["B", first, last, birthday, address, seat])
+        return status, seat
+
+    def place_passenger(self, first, last, birthday, address, wanted_seat):
         full_name = f"{first} {last}"
+        if full_name in self.passenger_data:
+            self.say(f"{full_name} already has a reservation.")
+            return "Duplicate", self.passenger_data[full_name]["seat"]
         
         if wanted_seat:
             r, c = self.get_indices(wanted_seat)
             
             if r is not None and 0 <= r < self.rows and 0 <= c < self.cols:
                 if self.seats[r][c] is None:
-                    self.save_booking(r, c, full_name, birthday, address)
-                    return
+                    return "Booked", self.save_booking(r, c, full_name, birthday, address)
                 else:
-                    print(f"Seat {wanted_seat} is already booked.")
-                    available = self.get_empty_seats()
-                    print(f"Available seats: {', '.join(available)}")
-                    return 
+                    if not self.quiet:
+                        print(f"Seat {wanted_seat} is already booked.")
+                        available = self.get_empty_seats()
+                        print(f"Available seats: {', '.join(available)}")
+                    return "Taken", wanted_seat
             else:
-                print("Invalid seat code.")
-                return
+                self.say("Invalid seat code.")
+                return "Invalid", wanted_seat
 
-        empty_indices = []
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.seats[r][c] is None:
-                    empty_indices.append((r, c))
+        if self.free_seats:
+            r, c = divmod(random.choice(self.free_seats), self.cols)
+            return "Booked", self.save_booking(r, c, full_name, birthday, address)
+        self.add_to_waitlist(first, last, birthday, address)
+        return "Waiting", "Waitlist"
 
-        if len(empty_indices) > 0:
-            r, c = random.choice(empty_indices)
-            self.save_booking(r, c, full_name, birthday, address)
-        else:
-            self.add_to_waitlist(first, last, birthday, address)
+    def bulk_book(self, records):
+        """Book every record of `records` in one pass and return a list of
+        BookingResult, one per record, in input order.
+
+        records is a path to a CSV file with a first,last,dob,address[,seat]
+        header, or any iterable of dicts with those keys or of tuples in that
+        order. Records are streamed, never loaded all at once; a record with
+        missing fields or a non-string seat comes back "Invalid" instead of
+        stopping the batch.
+        """
+        if isinstance(records, (str, os.PathLike)):
+            with open(records, newline="") as f:
+                return self.bulk_book(csv.DictReader(f))
+        results = []
+        append = results.append
+        book = self.add_passenger
+        for index, record in enumerate(records):
+            if isinstance(record, dict):
+                first, last, dob, address, seat = (record.get(k) for k in RECORD_FIELDS)
+            else:
+                first, last, dob, address, seat = (tuple(record) + (None,) * 5)[:5]
+            name = f"{first} {last}"
+            if not (first and last and dob and address is not None):
+                append(BookingResult(index, name, "Invalid", None))
+                continue
+            if seat is not None and not isinstance(seat, str):
+                append(BookingResult(index, name, "Invalid", seat))
+                continue
+            status, where = book(first, last, dob, address, seat.strip().upper() if seat else None)
+            append(BookingResult(index, name, status, where))
+        return results
 
     def save_booking(self, r, c, name, birthday, address):
         self.seats[r][c] = name
+        self.take_seat(r, c)
         seat_code = self.get_seat_name(r, c)
         
         self.passenger_data[name] = {
@@ -108,7 +432,8 @@ class FlightManager:
             "seat": seat_code,
             "status": "Booked"
         }
-        print(f"Booking confirmed for {name} at {seat_code}.")
+        self.say(f"Booking confirmed for {name} at {seat_code}.")
+        return seat_code
 
     def add_to_waitlist(self, first, last, birthday, address):
         name = f"{first} {last}"
@@ -122,48 +447,62 @@ class FlightManager:
             "dob": birthday,
             "address": address,
             "seat": "Waitlist",
-            "status": "Waiting"
+            "status": "Waiting",
+            "ticket": self.ticket_number,
+            "first": first
         }
-        print(f"All seats booked. {name} added to waitlist (Pos: {len(self.waiting_list)}).")
+        self.say(f"All seats booked. {name} added to waitlist (Pos: {len(self.waiting_list)}).")
 
     def cancel_passenger(self, name, birthday):
+        """Cancel a booking or waitlist entry; return whether one was removed."""
         if name not in self.passenger_data:
-            print("Error: Passenger not found.")
-            return
+            self.say("Error: Passenger not found.")
+            return False
 
         record = self.passenger_data[name]
         if record["dob"] != birthday:
-            print("Error: Date of Birth does not match.")
-            return
+            self.say("Error: Date of Birth does not match.")
+            return False
 
         current_seat = record["seat"]
 
         if current_seat == "Waitlist":
-            print(f"Removed {name} from waitlist.")
+            # The heap entry stays behind; promotion skips it (see below).
+            self.say(f"Removed {name} from waitlist.")
             del self.passenger_data[name]
-            return
+            self.record(["C", name, birthday])
+            return True
 
         r, c = self.get_indices(current_seat)
         self.seats[r][c] = None 
+        self.release_seat(r, c)
         del self.passenger_data[name]
-        print(f"Reservation for {name} at {current_seat} has been canceled.")
+        self.say(f"Reservation for {name} at {current_seat} has been canceled.")
 
-        if self.waiting_list:
-            _, p_data = heapq.heappop(self.waiting_list)
+        while self.waiting_list:
+            ticket, p_data = heapq.heappop(self.waiting_list)
             
             p_first = p_data["first"]
             p_last = p_data["last"]
             p_name = f"{p_first} {p_last}"
+            waiting = self.passenger_data.get(p_name)
+            if waiting is None or waiting.get("ticket") != ticket:
+                continue  # left the waitlist (or rejoined later) since
             
-            print(f"Waitlisted passenger {p_name} assigned to {current_seat}.")
+            self.say(f"Waitlisted passenger {p_name} assigned to {current_seat}.")
             self.save_booking(r, c, p_name, p_data["dob"], p_data["addr"])
+            break
+        self.record(["C", name, birthday])
+        return True
 
     def find_passenger(self, name, dob):
+        """Return the passenger's record, or None if name and dob do not match."""
         if name in self.passenger_data and self.passenger_data[name]["dob"] == dob:
             info = self.passenger_data[name]
-            print(f"Found: {name} | Status: {info['status']} | Seat: {info['seat']}")
-        else:
-            print("Passenger details not found.")
+            self.say(f"Found: {name} | Status: {info['status']} | Seat: {info['seat']}")
+            return info
+        self.say("Passenger details not found.")
+        return None
 
     def simulate_scenarios(self):
         print("\n--- RUNNING SIMULATION ---")
@@ -184,6 +523,253 @@ class FlightManager:
         self.cancel_passenger(target, "2000-01-01")
         self.show_seats(show_names=True)
 
+# Operations a FleetManager shard can run on one of its flights.
+FLEET_METHODS = {
+    "book": "add_passenger",
+    "cancel": "cancel_passenger",
+    "find": "find_passenger",
+    "free_seats": "get_empty_seats",
+    "free_count": "count_empty_seats",
+}
+
+
+def serve_shard(conn):
+    """Worker process loop: own a dict of flights and answer batches of
+    (op, flight_id, args) calls with a list of results, one per call. A call
+    that raises sends its exception back in its slot; None shuts down."""
+    random.seed()  # forked workers would otherwise share one seat sequence
+    flights = {}
+    while True:
+        batch = conn.recv()
+        if batch is None:
+            break
+        results = []
+        for op, flight_id, args in batch:
+            try:
+                if op == "add_flight":
+                    if flight_id in flights:
+                        raise ValueError(f"flight {flight_id!r} already exists")
+                    flights[flight_id] = FlightManager(*args, quiet=True)
+                    result = flight_id
+                elif op == "drop_flight":
+                    result = flights.pop(flight_id) is not None
+                else:
+                    flight = flights.get(flight_id)
+                    if flight is None:
+                        raise KeyError(f"no flight {flight_id!r}")
+                    result = getattr(flight, FLEET_METHODS[op])(*args)
+            except Exception as error:
+                result = error
+            results.append(result)
+        conn.send(results)
+    conn.close()
+
+
+class FleetManager:
+    """Many flights spread over worker processes.
+
+    Flights are partitioned by a stable hash of their ID; each worker holds
+    its flights' FlightManagers and runs their calls. batch() groups a list of
+    calls by worker, sends every group before waiting for any reply, so the
+    workers run in parallel, and hands back the results in call order.
+    Single calls (book, cancel, ...) are one-call batches, so prefer batch()
+    and free_seats() for throughput. Not safe to share between threads.
+    """
+
+    def __init__(self, workers=None):
+        workers = workers or os.cpu_count() or 1
+        self.conns = []
+        self.procs = []
+        for _ in range(workers):
+            parent_end, child_end = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=serve_shard, args=(child_end,), daemon=True)
+            proc.start()
+            child_end.close()
+            self.conns.append(parent_end)
+            self.procs.append(proc)
+
+    def shard(self, flight_id):
+        return zlib.crc32(str(flight_id).encode()) % len(self.conns)
+
+    def batch(self, calls):
+        """Run (op, flight_id, *args) calls and return their results in
+        order; a failed call's exception is returned in its place."""
+        groups = [[] for _ in self.conns]
+        where = []
+        for op, flight_id, *args in calls:
+            group = groups[self.shard(flight_id)]
+            where.append((group, len(group)))
+            group.append((op, flight_id, args))
+        for conn, group in zip(self.conns, groups):
+            if group:
+                conn.send(group)
+        replies = {id(group): conn.recv() for conn, group in zip(self.conns, groups) if group}
+        return [replies[id(group)][i] for group, i in where]
+
+    def call(self, op, flight_id, *args):
+        result = self.batch([(op, flight_id, *args)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def add_flight(self, flight_id, rows, cols):
+        return self.call("add_flight", flight_id, rows, cols)
+
+    def drop_flight(self, flight_id):
+        return self.call("drop_flight", flight_id)
+
+    def book(self, flight_id, first, last, birthday, address, wanted_seat=None):
+        return self.call("book", flight_id, first, last, birthday, address, wanted_seat)
+
+    def cancel(self, flight_id, name, birthday):
+        return self.call("cancel", flight_id, name, birthday)
+
+    def find(self, flight_id, name, birthday):
+        return self.call("find", flight_id, name, birthday)
+
+    def free_seats(self, flight_ids):
+        """Free seat codes of every flight in flight_ids, as {flight_id: [codes]}."""
+        flight_ids = list(flight_ids)
+        results = self.batch(("free_seats", flight_id) for flight_id in flight_ids)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return dict(zip(flight_ids, results))
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+            conn.close()
+        for proc in self.procs:
+            proc.join()
+        self.conns, self.procs = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FlightServer:
+    """asyncio front-end: newline-delimited JSON over TCP on localhost.
+
+    Each request is one JSON object per line with an "op" and a "flight",
+    plus the op's fields; each reply is one line {"ok": true, "result": ...}
+    or {"ok": false, "error": "..."}. Ops:
+
+        add_flight  flight rows cols
+        book        flight first last dob address [seat]
+        cancel      flight name dob
+        find        flight name dob
+        seat_map    flight            -> rows of "." (free) / "X" (taken)
+        free_seats  flight
+
+    Requests on one connection are answered in order; connections run
+    concurrently. A malformed or over-long request gets an error reply and
+    the connection stays open.
+
+    Every flight has its own asyncio.Lock, held for the whole of each op on
+    it. The O(1) ops (book, cancel, find) run on the event loop. The O(seats)
+    ones (building a flight's map, seat_map, free_seats) run in the default
+    thread pool, so a big map doesn't stall other flights' clients. The
+    flight's lock keeps them from interleaving with that flight's other ops,
+    so no two clients can take one seat.
+    """
+
+    LINE_LIMIT = 2**20
+
+    def __init__(self):
+        self.flights = {}
+        self.locks = {}
+
+    async def read_request(self, reader):
+        """The next request line, or None at EOF. A line over LINE_LIMIT is
+        skipped through its newline and reported with ValueError."""
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            return error.partial or None  # last line without a newline
+        except asyncio.LimitOverrunError as error:
+            skip = error.consumed
+        while True:
+            try:
+                await reader.readexactly(skip)  # already buffered: drop it
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.LimitOverrunError as error:
+                skip = error.consumed
+            except asyncio.IncompleteReadError:
+                break
+        raise ValueError(f"request line longer than {self.LINE_LIMIT} bytes")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await self.read_request(reader)
+                    if line is None:
+                        break
+                    request = json.loads(line)
+                    reply = {"ok": True, "result": await self.dispatch(request)}
+                except Exception as error:
+                    reply = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+                writer.write(encode_op(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        op, flight_id = request["op"], request["flight"]
+        loop = asyncio.get_running_loop()
+        if op == "add_flight":
+            if flight_id in self.locks:
+                raise ValueError(f"flight {flight_id!r} already exists")
+            # Claim the ID and hold its lock while the map is built off-loop:
+            # requests for the flight queue up behind it.
+            lock = self.locks[flight_id] = asyncio.Lock()
+            async with lock:
+                try:
+                    self.flights[flight_id] = await loop.run_in_executor(
+                        None, lambda: FlightManager(request["rows"], request["cols"], quiet=True))
+                except BaseException:
+                    del self.locks[flight_id]
+                    raise
+            return flight_id
+        lock = self.locks.get(flight_id)
+        if lock is None:
+            raise KeyError(f"no flight {flight_id!r}")
+        async with lock:
+            flight = self.flights.get(flight_id)
+            if flight is None:  # its add_flight failed while we waited
+                raise KeyError(f"no flight {flight_id!r}")
+            if op == "book":
+                seat = request.get("seat")
+                return flight.add_passenger(request["first"], request["last"], request["dob"],
+                                            request["address"], seat.strip().upper() if seat else None)
+            if op == "cancel":
+                return flight.cancel_passenger(request["name"], request["dob"])
+            if op == "find":
+                return flight.find_passenger(request["name"], request["dob"])
+            if op == "seat_map":
+                return await loop.run_in_executor(None, lambda: [
+                    "".join("." if seat is None else "X" for seat in row) for row in flight.seats])
+            if op == "free_seats":
+                return await loop.run_in_executor(None, flight.get_empty_seats)
+        raise ValueError(f"unknown op {op!r}")
+
+    async def serve(self, host="127.0.0.1", port=8642, ready=None):
+        """Serve until cancelled. With port=0 the OS picks a free port; the
+        bound port is put on `ready` (a queue-like object) when given."""
+        server = await asyncio.start_server(self.handle, host, port, limit=self.LINE_LIMIT)
+        if ready is not None:
+            ready.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
 def start_program():
     sys = FlightManager()
     
@@ -265,6 +851,12 @@ def start_program():
                 print("Invalid selection.")
 
 if __name__ == "__main__":
-    start_program()
+    # `python problem2.py --serve [port]` runs the network front-end instead of the menu.
+    if sys.argv[1:2] == ["--serve"]:
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8642
+        print(f"Serving flights on 127.0.0.1:{port}")
+        asyncio.run(FlightServer().serve(port=port))
+    else:
+        start_program()
 
     
\ No newline at end of file
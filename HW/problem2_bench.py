@@ -0,0 +1,356 @@
+"""
+Load benchmark for problem2.FlightManager
+-----------------------------------------
+Run directly: `python problem2_bench.py`.
+
+1) Sells out seat maps of growing size with auto-assigned bookings and
+   compares the free-seat index against the old full-grid scan, which made a
+   sell-out O(seats^2).
+2) bulk_book throughput from a CSV file and from an in-memory generator,
+   against the same records booked one add_passenger call at a time with
+   messages on.
+3) Durable flights: journal write throughput per fsync batch size, and
+   recovery time from the journal alone vs snapshot + journal tail.
+4) FleetManager: mixed book/find/cancel throughput across many flights as
+   worker processes are added, single calls vs batches, and batched
+   cross-flight free-seat queries.
+5) FlightServer: a local load generator (asyncio clients, one request in
+   flight per connection) reporting requests/s and p50/p99 latency, plus a
+   race of many clients for one seat.
+"""
+import asyncio
+import collections
+import contextlib
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from problem2 import FleetManager, FlightManager, FlightServer
+
+
+def make_manager(rows, cols, cls=FlightManager):
+    return cls(rows, cols, quiet=True)
+
+
+class ScanFlightManager(FlightManager):
+    """Auto-assignment as it was before the free-seat index: scan every seat."""
+
+    def add_passenger(self, first, last, birthday, address, wanted_seat=None):
+        empty_indices = []
+        for r in range(self.rows):
+            for c in range(self.cols):
+                if self.seats[r][c] is None:
+                    empty_indices.append((r, c))
+        if empty_indices:
+            r, c = random.choice(empty_indices)
+            self.save_booking(r, c, f"{first} {last}", birthday, address)
+        else:
+            self.add_to_waitlist(first, last, birthday, address)
+
+
+def sell_out(manager):
+    capacity = manager.rows * manager.cols
+    t0 = time.perf_counter()
+    for i in range(capacity):
+        manager.add_passenger(f"P{i}", "Load", "2000-01-01", "Load St")
+    return time.perf_counter() - t0
+
+
+def churn(manager, ops):
+    # Cancel a random booked passenger and book a new one, `ops` times.
+    booked = [name for name, rec in manager.passenger_data.items() if rec["status"] == "Booked"]
+    t0 = time.perf_counter()
+    for i in range(ops):
+        j = random.randrange(len(booked))
+        manager.cancel_passenger(booked[j], "2000-01-01")
+        booked[j] = f"C{i} Load"
+        manager.add_passenger(f"C{i}", "Load", "2000-01-01", "Load St")
+    return time.perf_counter() - t0
+
+
+def bench_sell_out():
+    random.seed(7)
+    rows = []
+    for seats in (1_000, 2_000, 4_000, 8_000):
+        scan = sell_out(make_manager(seats // 10, 10, ScanFlightManager))
+        indexed = sell_out(make_manager(seats // 10, 10))
+        rows.append((seats, scan, indexed))
+    for seats in (100_000, 400_000):
+        manager = make_manager(seats // 100, 100)
+        indexed = sell_out(manager)
+        assert manager.count_empty_seats() == 0 and not manager.get_empty_seats()
+        swaps = churn(manager, 100_000)
+        assert manager.count_empty_seats() == 0
+        rows.append((seats, None, indexed, swaps))
+
+    print("--- sell-out: grid scan vs free-seat index ---")
+    print(f"{'seats':>9} {'scan sell-out':>15} {'indexed sell-out':>17} {'us/booking':>11}")
+    for seats, scan, indexed, *rest in rows:
+        scan_text = f"{scan:13.3f} s" if scan is not None else f"{'-':>15}"
+        print(f"{seats:>9,} {scan_text} {indexed:15.3f} s {indexed / seats * 1e6:11.2f}")
+        if rest:
+            print(f"{'':>9}   100,000 cancel+rebook on the full map: {rest[0]:.3f} s")
+
+
+def passenger_records(n, rows, cols, seed=11):
+    """n booking records; one in ten asks for a specific seat, one in a
+    hundred repeats an earlier name and one in a thousand lacks a dob."""
+    rng = random.Random(seed)
+    for i in range(n):
+        first = f"P{rng.randrange(i)}" if i and rng.random() < 0.01 else f"P{i}"
+        dob = "" if rng.random() < 0.001 else f"19{rng.randrange(40, 100)}-01-01"
+        seat = f"{rng.randrange(rows) + 1}{chr(65 + rng.randrange(cols))}" if rng.random() < 0.1 else ""
+        yield first, "Bulk", dob, f"{i} Main St", seat
+
+
+def bench_bulk_book(n=300_000, rows=10_000, cols=25):
+    print(f"\n--- bulk_book: {n:,} records onto {rows * cols:,} seats ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "passengers.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["first", "last", "dob", "address", "seat"])
+            writer.writerows(passenger_records(n, rows, cols))
+
+        random.seed(5)
+        manager = make_manager(rows, cols)
+        t0 = time.perf_counter()
+        results = manager.bulk_book(path)
+        secs = time.perf_counter() - t0
+        assert len(results) == n
+        print(f"  from CSV          {secs:7.3f} s  {n / secs:10,.0f} records/s")
+        counts = collections.Counter(r.status for r in results)
+        print("  " + ", ".join(f"{status} {count:,}" for status, count in counts.most_common()))
+        del manager, results
+
+    random.seed(5)
+    manager = make_manager(rows, cols)
+    t0 = time.perf_counter()
+    manager.bulk_book(passenger_records(n, rows, cols))
+    secs = time.perf_counter() - t0
+    print(f"  from a generator  {secs:7.3f} s  {n / secs:10,.0f} records/s")
+    del manager
+
+    # The interactive path: one call per record with every message printed
+    # (to /dev/null). A taken seat prints the whole free list, so only the
+    # first tenth of the records is run this way.
+    sample = n // 10
+    random.seed(5)
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        manager = FlightManager(rows, cols)
+        t0 = time.perf_counter()
+        for first, last, dob, address, seat in itertools.islice(passenger_records(n, rows, cols), sample):
+            manager.add_passenger(first, last, dob, address, seat or None)
+        secs = time.perf_counter() - t0
+    print(f"  add_passenger + print, first {sample:,}  {secs:7.3f} s  {sample / secs:10,.0f} records/s")
+
+
+def run_ops(manager, ops, seed=13):
+    """ops bookings and cancellations, 60/40, against a live manager."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    names = []
+    t0 = time.perf_counter()
+    for i in range(ops):
+        if names and rng.random() < 0.4:
+            j = rng.randrange(len(names))
+            names[j], names[-1] = names[-1], names[j]
+            manager.cancel_passenger(names.pop(), "1990-01-01")
+        else:
+            manager.add_passenger(f"P{i}", "Durable", "1990-01-01", f"{i} Log Rd")
+            names.append(f"P{i} Durable")
+    return time.perf_counter() - t0
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def bench_persistence(ops=10**6, rows=1_000, cols=100):
+    print(f"\n--- durable flight: {ops:,} ops on {rows * cols:,} seats ---")
+    secs = run_ops(make_manager(rows, cols), ops)
+    print(f"  in memory only                 {secs:7.3f} s  {ops / secs:10,.0f} ops/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        few = ops // 100
+        for sync_every, count in ((1, few), (100, ops), (10_000, ops)):
+            path = os.path.join(tmp, f"sync{sync_every}")
+            manager = FlightManager.open(path, rows, cols, sync_every=sync_every)
+            secs = run_ops(manager, count)
+            manager.close()
+            print(f"  journal, fsync every {sync_every:>6,}   {secs:7.3f} s  {count / secs:10,.0f} ops/s"
+                  + (f"  ({count:,} ops)" if count != ops else ""))
+        journal_only = os.path.join(tmp, "sync10000")
+        print(f"  journal of {ops:,} ops: {dir_size(journal_only) / 2**20:.1f} MiB")
+
+        path = os.path.join(tmp, "snapshots")
+        manager = FlightManager.open(path, rows, cols, sync_every=10_000, snapshot_every=ops // 4 + 1)
+        secs = run_ops(manager, ops)
+        live = len(manager.passenger_data)
+        manager.close()
+        tail = ops - 3 * (ops // 4 + 1)
+        print(f"  + snapshot every {ops // 4 + 1:,} ops  {secs:7.3f} s  {ops / secs:10,.0f} ops/s")
+        print(f"  snapshot of {live:,} passengers: {os.path.getsize(os.path.join(path, 'snapshot.bin')) / 2**20:.1f} MiB")
+
+        t0 = time.perf_counter()
+        recovered = FlightManager.open(journal_only)
+        full = time.perf_counter() - t0
+        assert len(recovered.passenger_data) == live
+        recovered.close()
+        t0 = time.perf_counter()
+        recovered = FlightManager.open(path)
+        fast = time.perf_counter() - t0
+        assert len(recovered.passenger_data) == live
+        recovered.close()
+        print(f"  recovery, replay all {ops:,} ops        {full:7.3f} s")
+        print(f"  recovery, snapshot + {tail:,}-op tail  {fast:7.3f} s")
+
+
+def fleet_calls(flights, ops, seed=17):
+    """ops calls over `flights` flights: 60% book, 25% find, 15% cancel of a
+    passenger booked earlier in the stream."""
+    rng = random.Random(seed)
+    booked = []
+    calls = []
+    for i in range(ops):
+        roll = rng.random()
+        if booked and roll < 0.4:
+            flight, name = booked[rng.randrange(len(booked))]
+            calls.append(("find" if roll < 0.25 else "cancel", flight, name, "1980-01-01"))
+        else:
+            flight = f"FL{rng.randrange(flights)}"
+            calls.append(("book", flight, f"P{i}", "Fleet", "1980-01-01", f"{i} Hub Ave"))
+            booked.append((flight, f"P{i} Fleet"))
+    return calls
+
+
+def bench_fleet(flights=2_000, rows=30, cols=6, ops=200_000, batch=2_000, single=10_000,
+                worker_counts=(1, 2, 4, 8)):
+    print(f"\n--- FleetManager: {flights:,} flights of {rows * cols} seats, {ops:,} mixed calls ---")
+    calls = fleet_calls(flights, ops)
+    ids = [f"FL{i}" for i in range(flights)]
+
+    local = {flight: FlightManager(rows, cols, quiet=True) for flight in ids}
+    methods = {"book": "add_passenger", "find": "find_passenger", "cancel": "cancel_passenger"}
+    t0 = time.perf_counter()
+    for op, flight, *args in calls:
+        getattr(local[flight], methods[op])(*args)
+    secs = time.perf_counter() - t0
+    print(f"  in-process dict of flights        {ops / secs:10,.0f} calls/s")
+    del local
+
+    print(f"  {'workers':>7} {'single calls/s':>15} {'batched calls/s':>16} {'free seats, 100 flights':>24}")
+    for workers in worker_counts:
+        with FleetManager(workers) as fleet:
+            fleet.batch(("add_flight", flight, rows, cols) for flight in ids)
+            t0 = time.perf_counter()
+            for op, flight, *args in calls[:single]:
+                fleet.call(op, flight, *args)
+            single_rate = single / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for start in range(single, ops, batch):
+                results = fleet.batch(calls[start:start + batch])
+                assert not any(isinstance(r, Exception) for r in results)
+            batch_rate = (ops - single) / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            for start in range(0, flights, 100):
+                fleet.free_seats(ids[start:start + 100])
+            query = (time.perf_counter() - t0) / len(range(0, flights, 100))
+        print(f"  {workers:>7} {single_rate:15,.0f} {batch_rate:16,.0f} {query * 1e3:21.2f} ms")
+
+
+def run_server(ready):
+    asyncio.run(FlightServer().serve(port=0, ready=ready))
+
+
+async def request_lines(port, requests, latencies=None):
+    """Send requests one at a time on one connection; return the replies."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=2**20)
+    replies = []
+    for request in requests:
+        t0 = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        replies.append(json.loads(await reader.readline()))
+        if latencies is not None:
+            latencies.append(time.perf_counter() - t0)
+    writer.close()
+    await writer.wait_closed()
+    return replies
+
+
+def server_requests(count, flights, seed):
+    rng = random.Random(seed)
+    booked = []
+    for i in range(count):
+        roll = rng.random()
+        if booked and roll < 0.35:
+            flight, name = booked[rng.randrange(len(booked))]
+            yield {"op": "find" if roll < 0.25 else "cancel", "flight": flight, "name": name, "dob": "1970-01-01"}
+        elif roll < 0.4:
+            yield {"op": "seat_map", "flight": f"FL{rng.randrange(flights)}"}
+        else:
+            flight = f"FL{rng.randrange(flights)}"
+            name = f"S{seed}-{i}"
+            booked.append((flight, f"{name} Net"))
+            yield {"op": "book", "flight": flight, "first": name, "last": "Net", "dob": "1970-01-01",
+                   "address": f"{i} Socket Way"}
+
+
+async def load_test(port, clients, total, flights):
+    latencies = []
+    per_client = total // clients
+    t0 = time.perf_counter()
+    replies = await asyncio.gather(*(
+        request_lines(port, server_requests(per_client, flights, seed=c), latencies) for c in range(clients)))
+    secs = time.perf_counter() - t0
+    assert all(r["ok"] for batch in replies for r in batch)
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3
+    return len(latencies) / secs, pick(0.50), pick(0.99)
+
+
+async def seat_race(port, clients):
+    """Every client asks for seat 1A on the same flight at the same time."""
+    await request_lines(port, [{"op": "add_flight", "flight": "RACE", "rows": 1, "cols": 1}])
+    replies = await asyncio.gather(*(
+        request_lines(port, [{"op": "book", "flight": "RACE", "first": f"R{c}", "last": "Race",
+                              "dob": "1970-01-01", "address": "x", "seat": "1A"}]) for c in range(clients)))
+    return collections.Counter(batch[0]["result"][0] for batch in replies)
+
+
+def bench_server(flights=200, rows=30, cols=6, total=20_000, client_counts=(1, 8, 64)):
+    print(f"\n--- FlightServer on localhost: {flights} flights, {total:,} requests per run ---")
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=run_server, args=(ready,), daemon=True)
+    server.start()
+    try:
+        port = ready.get(timeout=30)
+        asyncio.run(request_lines(port, [{"op": "add_flight", "flight": f"FL{i}", "rows": rows, "cols": cols}
+                                         for i in range(flights)]))
+        print(f"  {'clients':>7} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for clients in client_counts:
+            rate, p50, p99 = asyncio.run(load_test(port, clients, total, flights))
+            print(f"  {clients:>7} {rate:10,.0f} {p50:8.3f} {p99:8.3f}")
+        outcome = asyncio.run(seat_race(port, 100))
+        assert outcome["Booked"] == 1
+        print(f"  100 clients racing for one seat: {dict(outcome)}")
+    finally:
+        server.terminate()
+        server.join()
+
+
+def main():
+    bench_sell_out()
+    bench_bulk_book()
+    bench_persistence()
+    bench_fleet()
+    bench_server()
+
+
+if __name__ == "__main__":
+    main()